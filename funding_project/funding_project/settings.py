@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'scanner.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -124,6 +125,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson, если установлен; иначе тот же вывод через стандартный JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': (
+        'scanner.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -183,6 +189,10 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=4, minute=0),
         'args': (30,), 
     },
+    'ensure-funding-partitions': {
+        'task': 'scanner.tasks.ensure_partitions_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
     'update-market-data': {
         'task': 'scanner.tasks.update_coingecko_data_task',
         'schedule': crontab(minute='15'), 
@@ -194,6 +204,27 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Лимиты публичных API бирж: limit единиц веса за period секунд.
+# Token bucket лежит в Redis и общий для всех процессов worker/beat.
+EXCHANGE_RATE_LIMITS = {
+    'Binance': {'limit': 500, 'period': 300},       # /fapi/v1/fundingRate: 500 / 5 мин на IP
+    'Bitget': {'limit': 20, 'period': 1},           # market-эндпоинты: 20 / сек
+    'Hyperliquid': {'limit': 1200, 'period': 60},   # info: 1200 веса / мин
+    'Kucoin': {'limit': 2000, 'period': 30},        # публичный пул: 2000 веса / 30 сек
+    'Paradex': {'limit': 120, 'period': 60},
+    'CoinEx': {'limit': 400, 'period': 10},
+    'Apex': {'limit': 60, 'period': 60},
+    'default': {'limit': 10, 'period': 1},
+}
+# Доля лимита, которую разрешено выбирать (запас на ручные запросы и дрейф часов)
+EXCHANGE_RATE_LIMIT_HEADROOM = float(os.getenv('EXCHANGE_RATE_LIMIT_HEADROOM', '0.9'))
+# Одновременных запросов к одному хосту биржи на процесс; пул фоновых потоков HTTP - вдвое больше
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', '8'))
+# Секционирование scanner_fundingrate (только PostgreSQL): 'month' или 'week'
+FUNDING_PARTITION_INTERVAL = os.getenv('FUNDING_PARTITION_INTERVAL', 'month')
+# Сколько будущих партиций держать созданными заранее
+FUNDING_PARTITIONS_AHEAD = int(os.getenv('FUNDING_PARTITIONS_AHEAD', '2'))
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -2,19 +2,26 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from .models import Favorite, Asset, Ticker, Asset, Exchange, FundingRate, ArbitragePosition, HyperliquidAgent, UserExchangeCredential, ParadexAgent
+from .models import Favorite, Asset, Ticker, Asset, Exchange, FundingRate, FundingRateHourly, FundingRateDaily, TickerStats, ArbitragePosition, HyperliquidAgent, UserExchangeCredential, ParadexAgent
 from starknet_py.net.signer.stark_curve_signer import KeyPair
 from .serializers import UserSerializer, FavoriteSerializer, AssetSerializer, ExchangeSerializer, ArbitragePositionSerializer, UserExchangeCredentialSerializer, ParadexAgentSerializer
-from django.db.models import Avg, Prefetch
+from django.db.models import Value
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from datetime import timedelta
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import requests
 from rest_framework.permissions import AllowAny
 import time
 from functools import lru_cache
 from eth_account import Account
 from .utils.encryption import EncryptionUtil
+from .services.ticker_stats import APR_QUANT, stats_period
+from .services.symbol_index import get_symbol_index
+from .services.ranking import get_ranking
+from .services.scanner_stats import get_scanner_stats
+from .services.funding_table import get_funding_table, normalize_params, sort_key, parse_points, apply_points
+from .utils.cursor import InvalidCursor, paginate_sorted, parse_page_size
+from .utils.data_version import conditional_on_data, patch_served_version
 from hyperliquid.exchange import Exchange as ExchangeHL
 from hyperliquid.utils import constants
 from eth_account import Account as EthAccount
@@ -82,6 +89,10 @@ class ToggleFavoriteView(APIView):
         
         return Response({"status": "added"})
 
+# raw - каждая ставка; 1h/1d - средние из часовых/дневных бакетов
+COIN_DETAIL_RESOLUTIONS = ('raw', '1h', '1d')
+
+@method_decorator(conditional_on_data, name='dispatch')
 class FundingTableAPIView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
@@ -89,126 +100,91 @@ class FundingTableAPIView(APIView):
         search = request.query_params.get('q', '').upper()
         sort_by = request.query_params.get('sort', 'spread')
         exchanges = request.query_params.getlist('exchanges')
+        points = parse_points(request.query_params.get('points'))
         
-        page_number = request.query_params.get('page', 1)
-        page_size = request.query_params.get('page_size', 10)
-
-        days_map = {'1h': 0.04, '4h': 0.16, '1d': 1, '3d': 3, '7d': 7, '30d': 30}
-        time_threshold = timezone.now() - timedelta(days=days_map.get(period, 1))
-
-        rates_queryset = FundingRate.objects.filter(
-            timestamp__gte=time_threshold
-        ).order_by('timestamp') 
-
-        tickers = Ticker.objects.select_related('exchange', 'asset').prefetch_related(
-            Prefetch('funding_rates', queryset=rates_queryset, to_attr='cached_rates')
-        )
-        
+        cursor = request.query_params.get('cursor')
+        page_size = parse_page_size(request.query_params.get('page_size'), 10)
+
+        requested_exchanges = exchanges
+        period, exchanges, sort_by = normalize_params(period, exchanges, sort_by)
+        # Все запрошенные биржи неизвестны: пустая таблица, а не все биржи сразу
+        table = get_funding_table(period, exchanges, sort_by) if exchanges or not requested_exchanges else None
+        result = table.rows if table else []
         if search:
-            tickers = tickers.filter(symbol__icontains=search)
-        if exchanges:
-            tickers = tickers.filter(exchange__name__in=exchanges)
-
-        grouped_data = {}
-        for t in tickers:
-            rates = t.cached_rates
-            if not rates:
-                continue
-
-            latest = rates[-1]
-            
-            total_apr = sum(r.apr for r in rates)
-            avg_apr = total_apr / len(rates)
-
-            frequency = 0
-            if len(rates) >= 2:
-                diff = rates[-1].timestamp - rates[-2].timestamp
-                hours = diff.total_seconds() / 3600
-                if hours > 0:
-                    frequency = round(24 / hours)
-
-            history_values = [float(r.apr) for r in rates]
-
-            row = {
-                'exchange': t.exchange.name,
-                'price': t.last_price,
-                'live_apr': float(latest.apr),     
-                'hist_apr': float(avg_apr),       
-                'frequency': frequency,          
-                'history': history_values,       
-                'image': t.asset.image_url if t.asset else None,
-                'market_cap': t.asset.market_cap if t.asset else 0,
-                'volume': t.asset.volume_24h if t.asset else 0,
-            }
-
-            symbol = t.symbol
-            if symbol not in grouped_data:
-                grouped_data[symbol] = []
-            grouped_data[symbol].append(row)
-
-        result = []
-        for symbol, rows in grouped_data.items():
-            aprs = [r['hist_apr'] for r in rows]
-            spread = max(aprs) - min(aprs) if len(aprs) > 1 else 0
-            
-            result.append({
-                'symbol': symbol,
-                'asset_info': rows[0], 
-                'spread': spread,
-                'exchanges_data': rows
-            })
+            matches = get_symbol_index().contains(search)
+            result = [row for row in result if row['symbol'] in matches]
 
-        if sort_by == 'market_cap':
-            result.sort(key=lambda x: x['asset_info']['market_cap'] or 0, reverse=True)
-        elif sort_by == 'apr':
-            result.sort(key=lambda x: max([abs(r['live_apr']) for r in x['exchanges_data']]), reverse=True)
-        else:
-            result.sort(key=lambda x: x['spread'], reverse=True)
-
-        paginator = Paginator(result, page_size)
         try:
-            page_obj = paginator.page(page_number)
-        except (PageNotAnInteger, EmptyPage):
-            page_obj = paginator.page(1)
-
-        return Response({
-            'count': paginator.count,     
-            'total_pages': paginator.num_pages,
-            'current_page': page_obj.number,
-            'results': list(page_obj)       
+            page, next_cursor, previous_cursor = paginate_sorted(result, sort_key(sort_by), 2, cursor, page_size)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = Response({
+            'count': len(result),     
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': apply_points(page, points)       
         })
+        if table:
+            patch_served_version(response, table.version, table.stale)
+        return response
 
+@method_decorator(conditional_on_data, name='dispatch')
 class CoinDetailAPIView(APIView):
     permission_classes = [AllowAny]
     def get(self, request, symbol):
+        resolution = request.query_params.get('resolution', 'raw')
+        if resolution not in COIN_DETAIL_RESOLUTIONS:
+            return Response({"error": f"resolution: {', '.join(COIN_DETAIL_RESOLUTIONS)}"}, status=400)
+
         time_threshold = timezone.now() - timedelta(days=30)
         
-        tickers = Ticker.objects.filter(symbol=symbol).select_related('exchange', 'asset')
+        tickers = list(Ticker.objects.filter(symbol=symbol).select_related('exchange', 'asset'))
         
-        if not tickers.exists():
+        if not tickers:
             return Response({"error": "Symbol not found"}, status=404)
 
-        asset_data = AssetSerializer(tickers.first().asset).data if tickers.first().asset else None
-        
+        asset_data = AssetSerializer(tickers[0].asset).data if tickers[0].asset else None
+
+        # Все биржи символа одним упорядоченным запросом: (ticker_id, время, сумма APR, число ставок, последний APR)
+        ticker_ids = [t.id for t in tickers]
+        if resolution == 'raw':
+            series = FundingRate.objects.filter(
+                ticker_id__in=ticker_ids, timestamp__gte=time_threshold, apr__isnull=False
+            ).annotate(samples=Value(1)).order_by('ticker_id', 'timestamp').values_list(
+                'ticker_id', 'timestamp', 'apr', 'samples', 'apr'
+            )
+        else:
+            model = FundingRateHourly if resolution == '1h' else FundingRateDaily
+            series = model.objects.filter(
+                ticker_id__in=ticker_ids, bucket__gte=time_threshold
+            ).order_by('ticker_id', 'bucket').values_list(
+                'ticker_id', 'bucket', 'apr_sum', 'apr_count', 'last_apr'
+            )
+
+        points = {ticker_id: [] for ticker_id in ticker_ids}
+        totals = {}
+        for ticker_id, moment, apr_sum, apr_count, last_apr in series:
+            points[ticker_id].append({'t': moment, 'v': (apr_sum / apr_count).quantize(APR_QUANT)})
+            total = totals.setdefault(ticker_id, [0, 0, None])
+            total[0] += apr_sum
+            total[1] += apr_count
+            total[2] = last_apr
+
         history = []
         summary_stats = []
-
         for t in tickers:
-            rates_qs = t.funding_rates.filter(timestamp__gte=time_threshold).order_by('timestamp')
-            
-            points = list(rates_qs.values('timestamp', 'apr'))
             history.append({
                 'exchange': t.exchange.name,
-                'points': [{'t': p['timestamp'], 'v': p['apr']} for p in points]
+                'points': points[t.id]
             })
 
-            avg_apr = rates_qs.aggregate(Avg('apr'))['apr__avg'] or 0
-            
-            latest_rate = rates_qs.last()
+            apr_sum, apr_count, last_apr = totals.get(t.id, (0, 0, None))
+            avg_apr = apr_sum / apr_count if apr_count else 0
             
             summary_stats.append({
                 'exchange': t.exchange.name,
-                'current_apr': latest_rate.apr if latest_rate else 0,
+                'current_apr': last_apr if last_apr is not None else 0,
                 'avg_apr': round(avg_apr, 2),
                 'price': float(t.last_price) if t.last_price else 0
             })
@@ -216,22 +192,20 @@ class CoinDetailAPIView(APIView):
         return Response({
             'symbol': symbol,
             'asset': asset_data,
+            'resolution': resolution,
             'summary_stats': summary_stats,
             'history': history
         })
     
+@method_decorator(conditional_on_data, name='dispatch')
 class ScannerStatsView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        stats = {
-            'total_coins': Ticker.objects.values('symbol').distinct().count(),
-            'total_exchanges': Exchange.objects.count(),
-            'last_update': FundingRate.objects.order_by('-timestamp').first().timestamp if FundingRate.objects.exists() else None
-        }
-        return Response(stats)
+        return Response(get_scanner_stats())
     
 
 
+@method_decorator(conditional_on_data, name='dispatch')
 class BestOpportunitiesAPIView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
@@ -239,58 +213,43 @@ class BestOpportunitiesAPIView(APIView):
         search_query = request.query_params.get('q', '').strip().upper()
         side_filter = request.query_params.get('side', 'ALL')
         
-        page_number = request.query_params.get('page', 1)
-        page_size = request.query_params.get('page_size', 30)
-
-        days_map = {'1d': 1, '3d': 3, '7d': 7, '14d': 14, '30d': 30}
-        time_threshold = timezone.now() - timedelta(days=days_map.get(period_param, 1))
-
-        tickers = Ticker.objects.select_related('exchange').prefetch_related(
-            Prefetch('funding_rates', 
-                     queryset=FundingRate.objects.filter(timestamp__gte=time_threshold),
-                     to_attr='filtered_rates')
-        )
-
-        if search_query:
-            tickers = tickers.filter(symbol__icontains=search_query)
-
-        opportunities = []
-        for t in tickers:
-            rates = t.filtered_rates 
-            if not rates: continue
-
-            avg_apr = sum(r.apr for r in rates) / len(rates)
-            if avg_apr == 0: continue
-
-            current_side = 'SHORT' if avg_apr > 0 else 'LONG'
-            yield_val = abs(float(avg_apr))
-
-            if side_filter != 'ALL' and side_filter != current_side:
-                continue
-
-            opportunities.append({
-                'symbol': t.symbol,
-                'exchange': t.exchange.name,
-                'apr': round(yield_val, 2),
-                'side': current_side,
-                'price': float(t.last_price) if t.last_price else 0,
-            })
-
-        opportunities.sort(key=lambda x: x['apr'], reverse=True)
+        exchanges = request.query_params.getlist('exchanges')
+        cursor = request.query_params.get('cursor')
+        page_size = parse_page_size(request.query_params.get('page_size'), 30)
 
-        paginator = Paginator(opportunities, page_size)
+        symbols = get_symbol_index().contains(search_query) if search_query else None
         try:
-            page_obj = paginator.page(page_number)
-        except:
-            page_obj = paginator.page(1)
+            page, next_cursor, previous_cursor, count = get_ranking().page(
+                stats_period(period_param), side_filter, exchanges, symbols, cursor, page_size
+            )
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        opportunities = [{
+            'symbol': item.symbol,
+            'exchange': item.exchange,
+            'apr': round(float(item.yield_apr), 2),
+            'side': item.side,
+            'price': float(item.price) if item.price else 0,
+        } for item in page]
 
         return Response({
-            'count': paginator.count,
-            'total_pages': paginator.num_pages,
-            'current_page': page_obj.number,
-            'results': list(page_obj)
+            'count': count,
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': opportunities
         })
     
+class SymbolSearchAPIView(APIView):
+    """Подсказки для строки поиска: символы, их активы и биржи"""
+    permission_classes = [AllowAny]
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        limit = parse_page_size(request.query_params.get('limit'), 10, maximum=50)
+        if not query:
+            return Response({'results': []})
+        return Response({'results': get_symbol_index().suggest(query, limit)})
+
 class ExchangeProxyView(APIView):
     permission_classes = [AllowAny]
 
@@ -1,13 +1,14 @@
 import time
 import logging
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from .base import BaseScanner
 
 logger = logging.getLogger(__name__)
 
 class ApexScanner(BaseScanner):
     BASE_URL = "https://pro.apex.exchange"
+    USE_CLOUDSCRAPER = True
 
     def __init__(self):
         super().__init__("Apex")
@@ -31,13 +32,13 @@ class ApexScanner(BaseScanner):
                     })
         return results
 
-    def fetch_funding_history(self, symbol, lookback_days=1):
+    def fetch_funding_history(self, symbol, since=None, lookback_days=30):
         url = f"{self.BASE_URL}/api/v1/history/funding-rate"
         
         now = datetime.now(timezone.utc)
         params = {
             "symbol": symbol,
-            "start_time": int((now - timedelta(days=lookback_days)).timestamp()),
+            "start_time": self._history_start_ms(since, lookback_days) // 1000,
             "end_time": int(now.timestamp())
         }
         
@@ -1,27 +1,173 @@
+import asyncio
 import logging
+import threading
+import time
 import cloudscraper
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
-from tenacity import retry, stop_after_attempt, wait_fixed, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception
 import urllib3
+from datetime import datetime, timezone, timedelta
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from scanner.utils.rate_limit import get_limiter
+from scanner.utils.circuit_breaker import get_breaker
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
+# Потолок ожидания между попытками, в том числе по Retry-After
+MAX_RETRY_WAIT = 30
+
+_exponential_jitter = wait_random_exponential(multiplier=1, max=MAX_RETRY_WAIT)
+
+
+def _is_retryable(exc):
+    """Повторяем только сетевые сбои, 429 и 5xx; 4xx и ошибки разбора сразу наверх"""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return False
+
+
+def _backoff_wait(retry_state):
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_WAIT)
+    return _exponential_jitter(retry_state)
+
+class FundingIntervalCache:
+    """
+    Интервалы выплат биржи {контракт: часы}, один запрос на процесс раз в ttl секунд.
+    Хранится на классе сканера: шарды создают сканеры заново, а потоки движка
+    истории ждут одну загрузку под блокировкой. Сбой без готовой карты - исключение
+    (история символа не пишется с чужим интервалом), со старой картой - работаем по ней.
+    """
+
+    TTL = 3600
+    # Через сколько секунд повторить загрузку после сбоя, если есть старая карта
+    RETRY_AFTER_FAILURE = 60
+
+    def __init__(self):
+        self._intervals = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, load):
+        with self._lock:
+            if self._intervals is None or time.monotonic() >= self._expires_at:
+                try:
+                    self._set(load())
+                except Exception as e:
+                    if self._intervals is None:
+                        raise
+                    logger.warning(f"Интервалы фандинга не обновлены, используются прежние: {e}")
+                    self._expires_at = time.monotonic() + self.RETRY_AFTER_FAILURE
+            return self._intervals
+
+    def set(self, intervals):
+        """Свежая карта, полученная попутно (например, снапшотом)"""
+        with self._lock:
+            self._set(intervals)
+
+    def _set(self, intervals):
+        self._intervals = intervals
+        self._expires_at = time.monotonic() + self.TTL
+
+
+class HttpTransport:
+    """
+    Keep-alive соединения процесса, общие для всех сканеров и задач.
+    requests.Session не обещает потокобезопасности, поэтому у каждого потока своя
+    сессия на хост; лимит max_per_host одновременных запросов к хосту общий на процесс.
+    Фоновые запросы идут через executor() - пул потоков, живущий вместе с транспортом,
+    поэтому их сессии и соединения переживают задачу. cloudscraper поднимается только
+    для хостов, которые его требуют.
+    """
+
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._local = threading.local()
+        self._host_slots = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        # На запрос в полёте (их не больше max_per_host на хост) - поток запроса
+        # и поток, ждущий места в очереди движка истории
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_per_host * 2, thread_name_prefix="http")
+        return self._executor
+
+    def _new_session(self, use_cloudscraper):
+        if use_cloudscraper:
+            return cloudscraper.create_scraper(
+                browser={
+                    'browser': 'chrome',
+                    'platform': 'windows',
+                    'desktop': True
+                }
+            )
+        session = requests.Session()
+        session.headers['User-Agent'] = self.USER_AGENT
+        # Поток делает один запрос за раз: одного соединения на хост достаточно
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _session_for(self, host, use_cloudscraper):
+        key = (host, use_cloudscraper)
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        if key not in sessions:
+            sessions[key] = self._new_session(use_cloudscraper)
+
+        with self._lock:
+            slots = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        return sessions[key], slots
+
+    def request(self, method, url, use_cloudscraper=False, **kwargs):
+        session, slots = self._session_for(urlparse(url).netloc, use_cloudscraper)
+        with slots:
+            return session.request(method, url, **kwargs)
+
+
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = HttpTransport(settings.HTTP_MAX_CONNECTIONS_PER_HOST)
+    return _transport
+
+
 class BaseScanner(ABC):
+    # Сколько символов движок истории качает одновременно
+    MAX_CONCURRENCY = 4
+    # Биржа отдаёт текущий фандинг всех контрактов одним запросом (fetch_funding_snapshot)
+    SUPPORTS_SNAPSHOT = False
+    # API за Cloudflare-проверкой, нужен cloudscraper
+    USE_CLOUDSCRAPER = False
+
     def __init__(self, exchange_name):
         self.name = exchange_name
+        self.limiter = get_limiter(exchange_name)
+        self.breaker = get_breaker(exchange_name)
+        self.transport = get_transport()
         
-        self.session = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'desktop': True
-            }
-        )
-        
-        headers = {
+        self.headers = {
             "Accept": "application/json, text/plain, */*",
             "Accept-Language": "en-US,en;q=0.9",
             "Sec-Ch-Ua": '"Chromium";v="122", "Not(A:Brand";v="24", "Google Chrome";v="122"',
@@ -36,69 +182,90 @@ class BaseScanner(ABC):
         if base_url:
             parsed_url = urlparse(base_url)
             origin = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            headers.update({
+            self.headers.update({
                 "Origin": origin,
                 "Referer": f"{origin}/"
             })
-        
-        self.session.headers.update(headers)
 
+    def _history_start_ms(self, since=None, lookback_days=30):
+        """Начало окна истории в мс: сразу после watermark или lookback_days назад"""
+        if since is not None:
+            return int(since.timestamp() * 1000) + 1
+        return int((datetime.now(timezone.utc) - timedelta(days=lookback_days)).timestamp() * 1000)
+
+    def _next_funding_time(self, period_hours):
+        """Ближайшее время выплаты для бирж с выплатами по сетке от полуночи UTC"""
+        now = datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        periods_passed = int((now - midnight).total_seconds() // (period_hours * 3600))
+        return midnight + timedelta(hours=(periods_passed + 1) * period_hours)
+
+    # Сканер переопределяет один из двух методов истории:
+    # постраничные биржи - iter_funding_history, одностраничные - fetch_funding_history.
+    def fetch_funding_history(self, symbol, since=None, lookback_days=30):
+        """Вся история символа одним списком"""
+        return [row for page in self.iter_funding_history(symbol, since=since, lookback_days=lookback_days) for row in page]
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2),
-           retry=retry_if_exception_type((requests.RequestException, Exception)), reraise=True)
-    def _get(self, url, params=None):
+    def iter_funding_history(self, symbol, since=None, lookback_days=30):
+        """Генератор страниц истории по мере ответов API"""
+        if type(self).fetch_funding_history is BaseScanner.fetch_funding_history:
+            # Иначе два метода по умолчанию вызывают друг друга до RecursionError
+            raise NotImplementedError(
+                f"{type(self).__name__} должен переопределить iter_funding_history или fetch_funding_history"
+            )
+        history = self.fetch_funding_history(symbol, since=since, lookback_days=lookback_days)
+        if history:
+            yield history
+
+    async def aiter_funding_history(self, symbol, **kwargs):
+        """Асинхронный итератор страниц: блокирующий генератор крутится в пуле потоков транспорта"""
+        pages = self.iter_funding_history(symbol, **kwargs)
+        loop = asyncio.get_running_loop()
+        while True:
+            page = await loop.run_in_executor(self.transport.executor(), next, pages, None)
+            if page is None:
+                break
+            yield page
+
+    @retry(stop=stop_after_attempt(4), wait=_backoff_wait,
+           retry=retry_if_exception(_is_retryable), reraise=True)
+    def _request(self, method, url, weight=1, **kwargs):
+        self.breaker.before_call()
+        self.limiter.acquire(weight)
         try:
-            response = self.session.get(url, params=params, timeout=15)
-            
-            if response.status_code == 429:
-                logger.warning(f"{self.name} 429 rate limit for {url}")
-            
-            response.raise_for_status()
-            
-            try:
-                return response.json()
-            except ValueError:
-                return response.text
-        except requests.HTTPError as e:
-            resp = getattr(e, 'response', None)
-            status = resp.status_code if resp is not None else 'N/A'
-            text = ''
-            try:
-                text = (resp.text[:1000] if resp is not None and resp.text else str(e))
-            except Exception:
-                text = str(e)
-            logger.warning(f"{self.name} _get HTTPError {status} for {url}. Body: {text}")
-            raise
+            response = self.transport.request(
+                method, url, use_cloudscraper=self.USE_CLOUDSCRAPER, timeout=15, **kwargs
+            )
         except Exception as e:
-            logger.warning(f"{self.name} _get Exception for {url}: {e}")
+            self.breaker.record_failure()
+            logger.warning(f"{self.name} {method} Exception for {url}: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2),
-           retry=retry_if_exception_type((requests.RequestException, Exception)), reraise=True)
-    def _post(self, url, data=None, json_data=None, params=None, headers=None):
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if response.status_code == 429:
+            logger.warning(f"{self.name} 429 rate limit for {url}")
+
         try:
-            # cloudscraper.session.post принимает json=... и data=...
-            resp = self.session.post(url, params=params, data=data, json=json_data, headers=headers, timeout=15)
-
-            if resp.status_code == 429:
-                logger.warning(f"{self.name} 429 rate limit for {url}")
-
-            resp.raise_for_status()
-
-            try:
-                return resp.json()
-            except ValueError:
-                return resp.text
-        except requests.HTTPError as e:
-            resp = getattr(e, 'response', None)
-            status = resp.status_code if resp is not None else 'N/A'
-            text = ''
-            try:
-                text = (resp.text[:1000] if resp is not None and resp.text else str(e))
-            except Exception:
-                text = str(e)
-            logger.warning(f"{self.name} _post HTTPError {status} for {url}. Body: {text}")
-            raise
-        except Exception as e:
-            logger.warning(f"{self.name} _post Exception for {url}: {e}")
+            response.raise_for_status()
+        except requests.HTTPError:
+            text = response.text[:1000] if response.text else ''
+            logger.warning(f"{self.name} {method} HTTPError {response.status_code} for {url}. Body: {text}")
             raise
+
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    def _get(self, url, params=None, weight=1):
+        return self._request('GET', url, weight=weight, params=params, headers=self.headers)
+
+    def _post(self, url, data=None, json_data=None, params=None, headers=None, weight=1):
+        return self._request(
+            'POST', url, weight=weight, params=params, data=data, json=json_data,
+            headers={**self.headers, **(headers or {})}
+        )
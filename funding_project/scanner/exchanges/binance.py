@@ -1,14 +1,33 @@
-import time
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
-from .base import BaseScanner
+from datetime import datetime, timezone
+from .base import BaseScanner, FundingIntervalCache
 
 class BinanceScanner(BaseScanner):
     BASE_URL = "https://fapi.binance.com"
+    MAX_CONCURRENCY = 6
 
     def __init__(self):
         super().__init__("Binance")
 
+    SUPPORTS_SNAPSHOT = True
+    # fundingInfo перечисляет только контракты с нестандартным интервалом, остальные платят раз в 8 часов
+    DEFAULT_FUNDING_HOURS = 8
+    # Общая на процесс карта интервалов: шарды и потоки истории не запрашивают её заново
+    _intervals = FundingIntervalCache()
+
+    def _load_intervals(self):
+        data = self._get(f"{self.BASE_URL}/fapi/v1/fundingInfo") or []
+        return {item['symbol']: int(item['fundingIntervalHours']) for item in data if item.get('fundingIntervalHours')}
+
+    def _funding_interval(self, symbol):
+        """Интервал выплат контракта в часах; без карты интервалов - исключение, а не 8 часов наугад"""
+        return self._intervals.get(self._load_intervals).get(symbol, self.DEFAULT_FUNDING_HOURS)
+
+    def _clean_symbol(self, symbol):
+        if symbol.endswith('USDT') or symbol.endswith('BUSD'):
+            return symbol[:-4]
+        return symbol
+
     def fetch_tickers(self):
         data = self._get(f"{self.BASE_URL}/fapi/v1/premiumIndex")
         if not data: return []
@@ -20,28 +39,42 @@ class BinanceScanner(BaseScanner):
                 continue
 
             price = item.get('markPrice')
-            
-            clean_symbol = symbol
-            if symbol.endswith('USDT'):
-                clean_symbol = symbol[:-4]
-            elif symbol.endswith('BUSD'):
-                clean_symbol = symbol[:-4]
 
             results.append({
-                'symbol': clean_symbol,
+                'symbol': self._clean_symbol(symbol),
                 'original_symbol': symbol,
                 'price': Decimal(str(price))
             })
         return results
 
-    def fetch_funding_history(self, coin, lookback_days=30):
-        all_history = []
-        start_dt = datetime.now(timezone.utc) - timedelta(days=lookback_days)
-        start_ts = int(start_dt.timestamp() * 1000)
+    def fetch_funding_snapshot(self):
+        """Прогноз ставки на ближайшую выплату по всем контрактам из premiumIndex"""
+        data = self._get(f"{self.BASE_URL}/fapi/v1/premiumIndex")
+        if not data: return []
+
+        results = []
+        for item in data:
+            symbol = item['symbol']
+            rate = item.get('lastFundingRate')
+            next_ts = int(item.get('nextFundingTime') or 0)
+            if "_" in symbol or rate in (None, '') or not next_ts:
+                continue
+
+            results.append({
+                'symbol': self._clean_symbol(symbol),
+                'original_symbol': symbol,
+                'price': Decimal(str(item.get('markPrice'))),
+                'timestamp': datetime.fromtimestamp(next_ts / 1000.0, tz=timezone.utc),
+                'rate': Decimal(str(rate)),
+                'period_hours': self._funding_interval(symbol)
+            })
+        return results
+
+    def iter_funding_history(self, coin, since=None, lookback_days=30):
+        start_ts = self._history_start_ms(since, lookback_days)
+        period_hours = self._funding_interval(coin)
         
         while True:
-            time.sleep(0.1) 
-            
             params = {
                 "symbol": coin,
                 "startTime": start_ts,
@@ -59,20 +92,18 @@ class BinanceScanner(BaseScanner):
                 ts_ms = item['fundingTime']
                 last_ts = ts_ms
                 
-                dt = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc)
+                dt = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).replace(second=0, microsecond=0)
                 rate = Decimal(str(item['fundingRate']))
                 
                 batch.append({
                     'timestamp': dt,
                     'rate': rate,
-                    'period_hours': 8 
+                    'period_hours': period_hours
                 })
             
-            all_history.extend(batch)
+            yield batch
             
             if len(data) < 1000:
                 break
             
-            start_ts = last_ts + 1
-            
-        return all_history
\ No newline at end of file
+            start_ts = last_ts + 1
\ No newline at end of file
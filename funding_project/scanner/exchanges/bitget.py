@@ -1,15 +1,46 @@
-import time
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
-from .base import BaseScanner 
+from datetime import datetime, timezone
+from .base import BaseScanner, FundingIntervalCache
 
 class BitgetScanner(BaseScanner): #
     TICKERS_URL = "https://api.bitget.com/api/v2/mix/market/tickers"
     FUNDING_URL = "https://api.bitget.com/api/v2/mix/market/history-fund-rate"
+    CURRENT_FUNDING_URL = "https://api.bitget.com/api/v2/mix/market/current-fund-rate"
+    MAX_CONCURRENCY = 6
+    SUPPORTS_SNAPSHOT = True
+    # Интервал выплат, если биржа его не вернула
+    DEFAULT_FUNDING_HOURS = 8
+    # Общая на процесс карта интервалов: шарды и потоки истории не запрашивают её заново
+    _intervals = FundingIntervalCache()
 
     def __init__(self):
         super().__init__("Bitget")
 
+    def _funding_schedule(self):
+        """{symbol: (интервал выплат в часах, время ближайшей выплаты)} по всем контрактам: бывают 1h, 4h и 8h"""
+        resp = self._get(self.CURRENT_FUNDING_URL, params={"productType": "USDT-FUTURES"})
+        schedule = {}
+        for item in resp.get("data") or []:
+            hours = int(item.get('fundingRateInterval') or self.DEFAULT_FUNDING_HOURS)
+            next_ms = int(item.get('nextUpdate') or 0)
+            next_time = datetime.fromtimestamp(next_ms / 1000.0, tz=timezone.utc) if next_ms else self._next_funding_time(hours)
+            schedule[item['symbol']] = (hours, next_time)
+        return schedule
+
+    def _load_intervals(self):
+        return {symbol: hours for symbol, (hours, _) in self._funding_schedule().items()}
+
+    def _funding_interval(self, original_symbol):
+        """Интервал выплат контракта для истории; без карты интервалов - исключение, а не 8 часов наугад"""
+        return self._intervals.get(self._load_intervals).get(original_symbol, self.DEFAULT_FUNDING_HOURS)
+
+    def _clean_symbol(self, original):
+        if original.endswith('USDT'):
+            return original[:-4]
+        elif original.endswith('USDT_SUMP'): 
+            return original.replace('USDT_SUMP', '')
+        return original
+
     def fetch_tickers(self):
         params = {"productType": "USDT-FUTURES"}
         try:
@@ -20,15 +51,9 @@ class BitgetScanner(BaseScanner): #
             results = []
             for item in data:
                 original = item['symbol']  
-                
-                clean_symbol = original
-                if original.endswith('USDT'):
-                    clean_symbol = original[:-4]
-                elif original.endswith('USDT_SUMP'): 
-                    clean_symbol = original.replace('USDT_SUMP', '')
 
                 results.append({
-                    'symbol': clean_symbol,          
+                    'symbol': self._clean_symbol(original),          
                     'original_symbol': original,     
                     'price': Decimal(str(item['lastPr']))
                 })
@@ -37,13 +62,44 @@ class BitgetScanner(BaseScanner): #
             print(f"Ошибка получения тикеров Bitget: {e}")
             return []
 
-    def fetch_funding_history(self, original_symbol, lookback_days=30):
-        all_history = []
+    def fetch_funding_snapshot(self):
+        """Текущая ставка всех контрактов из того же ответа tickers"""
+        params = {"productType": "USDT-FUTURES"}
+        try:
+            resp = self._get(self.TICKERS_URL, params=params)
+            data = resp.get("data")
+            if data is None: return []
+
+            schedule = self._funding_schedule()
+            self._intervals.set({symbol: hours for symbol, (hours, _) in schedule.items()})
+            results = []
+            for item in data:
+                rate = item.get('fundingRate')
+                if rate in (None, ''):
+                    continue
+
+                hours, funding_time = schedule.get(item['symbol'], (self.DEFAULT_FUNDING_HOURS, None))
+                results.append({
+                    'symbol': self._clean_symbol(item['symbol']),
+                    'original_symbol': item['symbol'],
+                    'price': Decimal(str(item['lastPr'])),
+                    'timestamp': funding_time or self._next_funding_time(hours),
+                    'rate': Decimal(str(rate)),
+                    'period_hours': hours
+                })
+            return results
+        except Exception as e:
+            print(f"Ошибка получения снапшота фандинга Bitget: {e}")
+            return []
+
+    def iter_funding_history(self, original_symbol, since=None, lookback_days=30):
+        total = 0
         now = datetime.now(tz=timezone.utc)
-        limit_ts = int((now - timedelta(days=lookback_days)).timestamp() * 1000)
+        limit_ts = self._history_start_ms(since, lookback_days)
         
         current_end_time = int(now.timestamp() * 1000)
         seen_timestamps = set()
+        period_hours = self._funding_interval(original_symbol)
 
         for i in range(15):
             params = {
@@ -60,6 +116,7 @@ class BitgetScanner(BaseScanner): #
                 if not data:
                     break
 
+                batch = []
                 for item in data:
                     f_time = int(item['fundingTime'])
                     
@@ -71,13 +128,16 @@ class BitgetScanner(BaseScanner): #
                     ts_key = int(floored.timestamp())
 
                     if ts_key not in seen_timestamps:
-                        all_history.append({
+                        batch.append({
                             'timestamp': floored,
                             'rate': Decimal(str(item['fundingRate'])),
-                            'period_hours': 8 
+                            'period_hours': period_hours
                         })
                         seen_timestamps.add(ts_key)
 
+                total += len(batch)
+                yield batch
+
                 oldest_in_batch = int(data[-1]['fundingTime'])
                 
                 if oldest_in_batch >= current_end_time:
@@ -87,13 +147,9 @@ class BitgetScanner(BaseScanner): #
                 
                 if oldest_in_batch < limit_ts:
                     break
-                
-                time.sleep(0.1)
 
             except Exception as e:
                 print(f"Bitget pagination error: {e}")
                 break
 
-        print(f"Bitget [{original_symbol}]: Собрано {len(all_history)} записей (глубина ~{len(all_history)//3} дн.)")
-        all_history.sort(key=lambda x: x['timestamp'])
-        return all_history
\ No newline at end of file
+        print(f"Bitget [{original_symbol}]: Собрано {total} записей (глубина ~{total//3} дн.)")
\ No newline at end of file
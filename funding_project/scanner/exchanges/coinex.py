@@ -34,11 +34,12 @@ class CoinexScanner(BaseScanner):
                     })
         return results
 
-    def fetch_funding_history(self, symbol, lookback_days=1):
+    def fetch_funding_history(self, symbol, since=None, lookback_days=30):
         url = f"{self.BASE_URL}/futures/funding-rate-history"
         
         params = {
             "market": symbol,
+            "start_time": self._history_start_ms(since, lookback_days),
             "limit": 50
         }
         
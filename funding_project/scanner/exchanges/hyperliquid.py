@@ -1,17 +1,21 @@
-import time
 from decimal import Decimal
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from .base import BaseScanner
 
 class HyperliquidScanner(BaseScanner):
     BASE_URL = "https://api.hyperliquid.xyz/info"
+    MAX_CONCURRENCY = 2
+    SUPPORTS_SNAPSHOT = True
 
     def __init__(self):
         super().__init__("Hyperliquid")
 
+    def _clean_symbol(self, original):
+        return original[4:] if original.startswith('1000') else original
+
     def fetch_tickers(self):
-        meta = self._post(self.BASE_URL, json_data={"type": "meta"})
-        mids = self._post(self.BASE_URL, json_data={"type": "allMids"})
+        meta = self._post(self.BASE_URL, json_data={"type": "meta"}, weight=20)
+        mids = self._post(self.BASE_URL, json_data={"type": "allMids"}, weight=2)
         
         if not meta or not mids: return []
 
@@ -21,28 +25,46 @@ class HyperliquidScanner(BaseScanner):
         for asset in universe:
             original = asset['name'] 
             
-            clean_symbol = original
-            if original.startswith('1000'):
-                clean_symbol = original[4:]
-            
             price = mids.get(original)
             if price:
                 results.append({
-                    'symbol': clean_symbol,
+                    'symbol': self._clean_symbol(original),
                     'original_symbol': original, 
                     'price': Decimal(str(price))
                 })
         return results
 
-    def fetch_funding_history(self, coin, lookback_days=30):
-        all_history = []
-        target_start_ms = int((datetime.now() - timedelta(days=lookback_days)).timestamp() * 1000)
+    def fetch_funding_snapshot(self):
+        """Текущая часовая ставка всех монет из metaAndAssetCtxs (выплата в начале следующего часа)"""
+        data = self._post(self.BASE_URL, json_data={"type": "metaAndAssetCtxs"}, weight=20)
+        if not data or len(data) < 2: return []
+
+        meta, ctxs = data[0], data[1]
+        funding_time = self._next_funding_time(1)
+
+        results = []
+        for asset, ctx in zip(meta.get('universe', []), ctxs):
+            price = ctx.get('markPx')
+            rate = ctx.get('funding')
+            if not price or rate is None:
+                continue
+
+            results.append({
+                'symbol': self._clean_symbol(asset['name']),
+                'original_symbol': asset['name'],
+                'price': Decimal(str(price)),
+                'timestamp': funding_time,
+                'rate': Decimal(str(rate)),
+                'period_hours': 1
+            })
+        return results
+
+    def iter_funding_history(self, coin, since=None, lookback_days=30):
+        target_start_ms = self._history_start_ms(since, lookback_days)
         
         current_start_ms = target_start_ms
 
         while True:
-            time.sleep(0.5) 
-            
             payload = {
                 "type": "fundingHistory",
                 "coin": coin,
@@ -50,9 +72,11 @@ class HyperliquidScanner(BaseScanner):
             }
             
             try:
-                data = self._post(self.BASE_URL, json_data=payload)
+                data = self._post(self.BASE_URL, json_data=payload, weight=20)
                 if not data or not isinstance(data, list):
                     break
+                # fundingHistory дополнительно весит 1 за каждые 20 записей ответа
+                self.limiter.charge(len(data) // 20)
 
                 batch = []
                 last_ts_in_batch = current_start_ms
@@ -60,14 +84,16 @@ class HyperliquidScanner(BaseScanner):
                 for item in data:
                     last_ts_in_batch = item['time']
                     
+                    # time приходит с миллисекундным хвостом, выравниваем по часу как в снапшоте
                     ts = datetime.fromtimestamp(item['time'] / 1000.0, tz=timezone.utc)
+                    ts = ts.replace(minute=0, second=0, microsecond=0)
                     batch.append({
                         'timestamp': ts,
                         'rate': Decimal(str(item['fundingRate'])),
                         'period_hours': 1
                     })
                 
-                all_history.extend(batch)
+                yield batch
                 
                 if len(data) < 500:
                     break
@@ -79,6 +105,4 @@ class HyperliquidScanner(BaseScanner):
 
             except Exception as e:
                 print(f"Ошибка HL для {coin}: {e}")
-                break
-                
-        return all_history
\ No newline at end of file
+                break
\ No newline at end of file
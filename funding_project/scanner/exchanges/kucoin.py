@@ -1,6 +1,5 @@
-import time
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from .base import BaseScanner
 
 class KucoinScanner(BaseScanner):
@@ -10,7 +9,7 @@ class KucoinScanner(BaseScanner):
         super().__init__("Kucoin")
 
     def fetch_tickers(self):
-        response = self._get(f"{self.BASE_URL}/api/v1/contracts/active")
+        response = self._get(f"{self.BASE_URL}/api/v1/contracts/active", weight=3)
         if not response or 'data' not in response: return []
         
         results = []
@@ -32,17 +31,13 @@ class KucoinScanner(BaseScanner):
                 })
         return results
 
-    def fetch_funding_history(self, coin, lookback_days=30):
-        all_history = []
-        
+    def iter_funding_history(self, coin, since=None, lookback_days=30):
         end_ts = int(datetime.now(timezone.utc).timestamp() * 1000)
-        start_ts = int((datetime.now(timezone.utc) - timedelta(days=lookback_days)).timestamp() * 1000)
+        start_ts = self._history_start_ms(since, lookback_days)
         
         current_to = end_ts
         
         while True:
-            time.sleep(0.15)
-            
             params = {
                 "symbol": coin,
                 "from": start_ts,
@@ -50,7 +45,7 @@ class KucoinScanner(BaseScanner):
                 "limit": 100
             }
             
-            resp = self._get(f"{self.BASE_URL}/api/v1/contract/funding-rates", params=params)
+            resp = self._get(f"{self.BASE_URL}/api/v1/contract/funding-rates", params=params, weight=5)
             
             if not resp or 'data' not in resp: break
             data = resp['data'] # список
@@ -73,7 +68,7 @@ class KucoinScanner(BaseScanner):
                     'period_hours': 8 
                 })
                 
-            all_history.extend(batch)
+            yield batch
             
             if len(data) < 100:
                 break
@@ -81,6 +76,4 @@ class KucoinScanner(BaseScanner):
             if min_ts_in_batch <= start_ts:
                 break
                 
-            current_to = min_ts_in_batch - 1
-            
-        return all_history
\ No newline at end of file
+            current_to = min_ts_in_batch - 1
\ No newline at end of file
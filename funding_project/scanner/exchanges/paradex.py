@@ -1,11 +1,12 @@
-import time
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from .base import BaseScanner
 
 class ParadexScanner(BaseScanner):
     BASE_URL = "https://api.prod.paradex.trade"
     SAMPLE_INTERVAL_MINUTES = 60
+    USE_CLOUDSCRAPER = True
+    MAX_CONCURRENCY = 2
 
     def __init__(self):
         super().__init__("Paradex")
@@ -35,9 +36,9 @@ class ParadexScanner(BaseScanner):
             print(f"Paradex fetch_tickers error: {e}")
             return []
 
-    def fetch_funding_history(self, market, lookback_days=30):
+    def fetch_funding_history(self, market, since=None, lookback_days=30):
         all_history = []
-        start_at = int((datetime.now(tz=timezone.utc) - timedelta(days=lookback_days)).timestamp() * 1000)
+        start_at = self._history_start_ms(since, lookback_days)
         
         url = f"{self.BASE_URL}/v1/funding/data"
         params = {
@@ -72,8 +73,6 @@ class ParadexScanner(BaseScanner):
                     })
                     seen_hours.add(floored_ts)
 
-            time.sleep(0.2)
-
         except Exception as e:
             print(f"Paradex fetch history error for {market}: {e}")
 
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from scanner.models import Ticker
+from scanner.services.rollups import refresh_rollups
+from scanner.services.ticker_stats import refresh_ticker_stats
+
+class Command(BaseCommand):
+    help = 'Rebuilds hourly/daily funding rollups and ticker stats from raw funding rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='How many days of history to rebuild')
+        parser.add_argument('--chunk', type=int, default=200, help='Tickers per pass')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        ticker_ids = list(Ticker.objects.values_list('id', flat=True))
+
+        buckets = 0
+        for i in range(0, len(ticker_ids), options['chunk']):
+            chunk = ticker_ids[i:i + options['chunk']]
+            buckets += refresh_rollups(dict.fromkeys(chunk, since))
+            refresh_ticker_stats(chunk)
+            self.stdout.write(f"{min(i + options['chunk'], len(ticker_ids))}/{len(ticker_ids)} tickers")
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} rollup buckets'))
@@ -0,0 +1,48 @@
+import re
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # без brotli остаётся gzip
+    brotli = None
+
+re_accepts_brotli = re.compile(r"\bbr\b")
+
+# Меньше этого сжатие не окупает CPU
+MIN_COMPRESS_SIZE = 1024
+# 5 - почти размер 11-го уровня при скорости порядка gzip
+BROTLI_QUALITY = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжимает крупные JSON-ответы API: brotli, если клиент его принимает и пакет
+    установлен, иначе gzip. HTML не трогаем - в шаблонах CSRF-токен (BREACH).
+    """
+
+    def process_response(self, request, response):
+        if not response.get("Content-Type", "").startswith("application/json"):
+            return response
+        if response.streaming or len(response.content) < MIN_COMPRESS_SIZE:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+
+        # Сжатое тело - уже другое представление: сильный ETag становится слабым, как в GZipMiddleware
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
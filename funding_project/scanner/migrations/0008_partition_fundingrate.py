@@ -0,0 +1,103 @@
+# Перевод scanner_fundingrate на секционирование по timestamp (только PostgreSQL).
+# Состояние модели не меняется: Django по-прежнему видит id как первичный ключ,
+# а в базе PK становится (id, timestamp), как того требует секционированная таблица.
+
+from django.conf import settings
+from django.db import migrations
+
+from scanner.utils.partitions import (
+    FUNDING_TABLE, create_partitions, is_partitioned, partition_horizon, partition_interval,
+)
+
+
+def _table_layout(cursor, table):
+    """Ограничения и индексы таблицы, которые нужно перенести на новую"""
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid), conindid
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f')
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+    constraint_indexes = {row[3] for row in constraints}
+
+    cursor.execute(
+        """
+        SELECT indexrelid, pg_get_indexdef(indexrelid)
+        FROM pg_index
+        WHERE indrelid = to_regclass(%s)
+        """,
+        [table],
+    )
+    indexes = [indexdef for oid, indexdef in cursor.fetchall() if oid not in constraint_indexes]
+    return constraints, indexes
+
+
+def _rebuild(schema_editor, partitioned):
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    legacy = f"{FUNDING_TABLE}_legacy"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint WHERE confrelid = to_regclass(%s)",
+            [FUNDING_TABLE],
+        )
+        if cursor.fetchone()[0]:
+            raise RuntimeError(f"{FUNDING_TABLE}: на таблицу ссылаются внешние ключи, секционирование невозможно")
+
+        constraints, indexes = _table_layout(cursor, FUNDING_TABLE)
+
+        cursor.execute(f"ALTER TABLE {quote(FUNDING_TABLE)} RENAME TO {quote(legacy)}")
+        partition_clause = ' PARTITION BY RANGE ("timestamp")' if partitioned else ''
+        cursor.execute(
+            f"CREATE TABLE {quote(FUNDING_TABLE)} "
+            f"(LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY){partition_clause}"
+        )
+
+        if partitioned:
+            cursor.execute(f"SELECT min(timestamp), greatest(max(timestamp), now()) FROM {quote(legacy)}")
+            oldest, newest = cursor.fetchone()
+            interval = partition_interval()
+            ahead = getattr(settings, 'FUNDING_PARTITIONS_AHEAD', 2)
+            create_partitions(connection, oldest or newest, partition_horizon(newest, interval, ahead), interval)
+
+        cursor.execute(f"INSERT INTO {quote(FUNDING_TABLE)} SELECT * FROM {quote(legacy)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {quote(FUNDING_TABLE)}",
+            [FUNDING_TABLE],
+        )
+        cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+        # Имена ограничений и индексов освободились вместе со старой таблицей - восстанавливаем их как были
+        for name, kind, definition, _ in constraints:
+            if kind == 'p':
+                definition = 'PRIMARY KEY (id, "timestamp")' if partitioned else 'PRIMARY KEY (id)'
+            cursor.execute(f"ALTER TABLE {quote(FUNDING_TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+
+
+def partition_funding_rates(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or is_partitioned(schema_editor.connection):
+        return
+    _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_funding_rates(apps, schema_editor):
+    if not is_partitioned(schema_editor.connection):
+        return
+    _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0007_paradexagent'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_funding_rates, unpartition_funding_rates),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0008_partition_fundingrate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundingRateDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('apr_sum', models.DecimalField(decimal_places=4, max_digits=24)),
+                ('apr_count', models.IntegerField()),
+                ('apr_min', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('apr_max', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('last_apr', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('last_timestamp', models.DateTimeField()),
+                ('period_hours', models.IntegerField(default=1)),
+                ('ticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='scanner.ticker')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['bucket'], name='scanner_fun_bucket_d323d2_idx')],
+                'unique_together': {('ticker', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FundingRateHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('apr_sum', models.DecimalField(decimal_places=4, max_digits=24)),
+                ('apr_count', models.IntegerField()),
+                ('apr_min', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('apr_max', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('last_apr', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('last_timestamp', models.DateTimeField()),
+                ('period_hours', models.IntegerField(default=1)),
+                ('ticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='scanner.ticker')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['bucket'], name='scanner_fun_bucket_38be62_idx')],
+                'unique_together': {('ticker', 'bucket')},
+            },
+        ),
+    ]
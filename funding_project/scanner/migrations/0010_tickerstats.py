@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0009_fundingratedaily_fundingratehourly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=8)),
+                ('avg_apr', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('live_apr', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('frequency', models.IntegerField(default=0)),
+                ('history', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='scanner.ticker')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'avg_apr'], name='scanner_tic_period_896126_idx')],
+                'unique_together': {('ticker', 'period')},
+            },
+        ),
+    ]
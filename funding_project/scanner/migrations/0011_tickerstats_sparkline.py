@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0010_tickerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickerstats',
+            name='sparkline',
+            field=models.JSONField(default=list, help_text='history, прореженная до SPARKLINE_POINTS точек'),
+        ),
+    ]
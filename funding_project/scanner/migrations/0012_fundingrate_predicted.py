@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:25
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_future_rows(apps, schema_editor):
+    # Строки на ещё не наступившие выплаты могли прийти только из снапшота
+    FundingRate = apps.get_model('scanner', 'FundingRate')
+    FundingRate.objects.filter(timestamp__gt=timezone.now()).update(predicted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0011_tickerstats_sparkline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundingrate',
+            name='predicted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_future_rows, migrations.RunPython.noop),
+    ]
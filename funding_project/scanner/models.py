@@ -1,3 +1,4 @@
+from decimal import Decimal
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -6,6 +7,20 @@ from .utils.encryption import EncryptionUtil
 
 User = get_user_model()
 
+
+HOURS_PER_YEAR = 24 * 365
+
+
+def calculate_apr(rate, period_hours):
+    """Годовая доходность в % для ставки за период period_hours часов"""
+    apr = Decimal(str(rate)) * HOURS_PER_YEAR / Decimal(str(period_hours)) * 100
+    return apr.quantize(Decimal("0.0001"))
+
+
+def asset_symbol_for(ticker_symbol):
+    """Универсальный символ актива для тикера биржи (1000PEPE -> PEPE)"""
+    return ticker_symbol.upper().replace('1000', '').replace('K', '').split('-')[0]
+
 class Exchange(models.Model):
     name = models.CharField(max_length=50, unique=True)
     is_active = models.BooleanField(default=True)
@@ -42,9 +57,7 @@ class Ticker(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.asset_id:
-            clean_symbol = self.symbol.upper().replace('1000', '').replace('K', '').split('-')[0]
-            
-            asset_obj, _ = Asset.objects.get_or_create(symbol=clean_symbol)
+            asset_obj, _ = Asset.objects.get_or_create(symbol=asset_symbol_for(self.symbol))
             self.asset = asset_obj
             
         super().save(*args, **kwargs)
@@ -58,8 +71,8 @@ class FundingRate(models.Model):
     rate = models.DecimalField(max_digits=20, decimal_places=10)
     period_hours = models.IntegerField(default=1) 
     apr = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
-
-   
+    # Прогноз из снапшота на ещё не подтверждённую выплату; история заменяет его фактической ставкой
+    predicted = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-timestamp']
@@ -70,12 +83,67 @@ class FundingRate(models.Model):
 
     def save(self, *args, **kwargs):
         if self.rate is not None and self.period_hours:
-            periods_per_year = (24 / self.period_hours) * 365
-            self.apr = float(self.rate) * periods_per_year * 100
+            self.apr = calculate_apr(self.rate, self.period_hours)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.ticker.symbol} @ {self.timestamp}: {self.apr}% APR"
+
+
+class FundingRollup(models.Model):
+    """Агрегат APR тикера за бакет времени; пересчитывается при записи ставок"""
+    bucket = models.DateTimeField()
+    apr_sum = models.DecimalField(max_digits=24, decimal_places=4)
+    apr_count = models.IntegerField()
+    apr_min = models.DecimalField(max_digits=10, decimal_places=4)
+    apr_max = models.DecimalField(max_digits=10, decimal_places=4)
+    last_apr = models.DecimalField(max_digits=10, decimal_places=4)
+    last_timestamp = models.DateTimeField()
+    period_hours = models.IntegerField(default=1)
+
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+        unique_together = ('ticker', 'bucket')
+
+
+class FundingRateHourly(FundingRollup):
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='hourly_rollups')
+
+    class Meta(FundingRollup.Meta):
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+
+class FundingRateDaily(FundingRollup):
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='daily_rollups')
+
+    class Meta(FundingRollup.Meta):
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+
+class TickerStats(models.Model):
+    """Готовая статистика тикера за период (live, 1h ... 30d); обновляется после скана биржи"""
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name='stats')
+    period = models.CharField(max_length=8)
+    avg_apr = models.DecimalField(max_digits=10, decimal_places=4)
+    live_apr = models.DecimalField(max_digits=10, decimal_places=4)
+    frequency = models.IntegerField(default=0)
+    history = models.JSONField(default=list)
+    sparkline = models.JSONField(default=list, help_text="history, прореженная до SPARKLINE_POINTS точек")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('ticker', 'period')
+        indexes = [
+            models.Index(fields=['period', 'avg_apr']),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker.symbol} [{self.period}]: {self.avg_apr}% APR"
     
 
 class Favorite(models.Model):
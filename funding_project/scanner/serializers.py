@@ -75,13 +75,20 @@ class ArbitragePositionSerializer(serializers.ModelSerializer):
 
     def _get_ticker(self, exchange_name, symbol_str):
         from django.db.models import Q
+        from .services.symbol_index import get_symbol_index
         base_symbol = symbol_str.replace('USDT', '')
-        
-        ticker = Ticker.objects.filter(exchange__name__iexact=exchange_name).filter(
-            Q(symbol__iexact=symbol_str) | 
-            Q(symbol__iexact=base_symbol) |
-            Q(original_symbol__iexact=symbol_str)
-        ).first()
+
+        index = get_symbol_index()
+        ticker_id = index.ticker_id(exchange_name, symbol_str) or index.ticker_id(exchange_name, base_symbol)
+        ticker = Ticker.objects.filter(pk=ticker_id).first() if ticker_id else None
+
+        if not ticker:
+            # Тикер мог появиться после последней перестройки индекса
+            ticker = Ticker.objects.filter(exchange__name__iexact=exchange_name).filter(
+                Q(symbol__iexact=symbol_str) | 
+                Q(symbol__iexact=base_symbol) |
+                Q(original_symbol__iexact=symbol_str)
+            ).first()
         
         if not ticker:
             raise serializers.ValidationError(f"Тикер {symbol_str} не найден на бирже {exchange_name}")
@@ -1,15 +1,27 @@
 import requests
 import time
+from decimal import Decimal
 from scanner.models import Asset
 
 class CoinGeckoService:
     BASE_URL = "https://api.coingecko.com/api/v3"
+    SYNC_FIELDS = ['market_cap', 'volume_24h', 'image_url', 'coingecko_id']
+
+    def _to_decimal(self, value):
+        # Точность как у DecimalField(decimal_places=2), чтобы сравнение с БД было честным
+        if value is None:
+            return None
+        return Decimal(str(value)).quantize(Decimal('0.01'))
 
     def update_market_data(self):
         print("CoinGecko: Начинаю обновление данных рынка...")
         
         page = 1
         total_updated = 0
+
+        assets = {a.symbol: a for a in Asset.objects.only('id', 'symbol', *self.SYNC_FIELDS)}
+        owners = {a.coingecko_id: a.id for a in assets.values() if a.coingecko_id}
+        seen_symbols = set()
         
         while page <= 4: 
             try:
@@ -37,15 +49,37 @@ class CoinGeckoService:
                 if not data: 
                     break
 
+                changed = []
                 for coin in data:
                     cg_symbol = coin['symbol'].upper()
-                    count = Asset.objects.filter(symbol=cg_symbol).update(
-                        market_cap=coin.get('market_cap'),
-                        volume_24h=coin.get('total_volume'),
-                        image_url=coin.get('image'),
-                        coingecko_id=coin.get('id')
-                    )
-                    total_updated += count
+                    asset = assets.get(cg_symbol)
+                    # Монеты идут по убыванию капитализации: одноимённые мелкие не перетирают крупную
+                    if asset is None or cg_symbol in seen_symbols:
+                        continue
+                    seen_symbols.add(cg_symbol)
+
+                    values = {
+                        'market_cap': self._to_decimal(coin.get('market_cap')),
+                        'volume_24h': self._to_decimal(coin.get('total_volume')),
+                        'image_url': coin.get('image'),
+                    }
+                    cg_id = coin.get('id')
+                    if cg_id and owners.get(cg_id, asset.id) == asset.id:
+                        values['coingecko_id'] = cg_id
+
+                    if all(getattr(asset, field) == value for field, value in values.items()):
+                        continue
+
+                    if 'coingecko_id' in values and cg_id != asset.coingecko_id:
+                        owners.pop(asset.coingecko_id, None)
+                        owners[cg_id] = asset.id
+                    for field, value in values.items():
+                        setattr(asset, field, value)
+                    changed.append(asset)
+
+                if changed:
+                    Asset.objects.bulk_update(changed, self.SYNC_FIELDS)
+                    total_updated += len(changed)
 
                 print(f"CoinGecko Страница {page} обработана.")
                 page += 1
@@ -0,0 +1,180 @@
+import logging
+import zlib
+from collections import namedtuple
+import redis
+from celery import current_app
+from scanner.models import Exchange, TickerStats
+from scanner.renderers import dumps, loads
+from scanner.services.ticker_stats import SPARKLINE_POINTS, stats_period
+from scanner.utils.downsample import lttb
+from scanner.utils.data_version import VersionedValue, get_data_version
+from scanner.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SORTS = ('spread', 'market_cap', 'apr')
+DEFAULT_SORT = 'spread'
+# Неиспользуемые комбинации фильтров сами уходят из Redis
+SNAPSHOT_TTL = 24 * 3600
+# Сколько секунд одна пересборка снапшота считается идущей
+REBUILD_LOCK_TTL = 60
+# Снапшот с историями - сотни КБ JSON; в Redis лежит сжатым (быстрый уровень zlib)
+SNAPSHOT_COMPRESSION_LEVEL = 3
+
+# rows - таблица; version - версия данных, на которой она собрана; stale - версия уже не текущая
+FundingTable = namedtuple('FundingTable', ['rows', 'version', 'stale'])
+
+
+# Имена бирж из базы; перечитываются вместе с версией данных
+_exchange_names = VersionedValue(lambda: frozenset(Exchange.objects.values_list('name', flat=True)))
+
+
+def normalize_params(period, exchanges, sort_by):
+    """
+    Канонические параметры таблицы. Неизвестные биржи отбрасываются: каждая комбинация
+    бирж - отдельный снапшот в Redis, и произвольные строки из запроса плодили бы ключи.
+    """
+    exchanges = sorted(set(exchanges) & _exchange_names.get())
+    return stats_period(period), exchanges, sort_by if sort_by in SORTS else DEFAULT_SORT
+
+
+# Потолок points=: шире спарклайн на фронте не рисуется
+MAX_SPARKLINE_POINTS = 500
+
+
+def parse_points(value):
+    """points= из запроса: None - отдать историю целиком"""
+    try:
+        points = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(max(points, 3), MAX_SPARKLINE_POINTS)
+
+
+def apply_points(results, points):
+    """Заменяет history строк страницы спарклайном нужной ширины; готовый берётся из TickerStats"""
+    for item in results:
+        for row in [item['asset_info'], *item['exchanges_data']]:
+            sparkline = row.pop('sparkline', None)
+            if points is None:
+                continue
+            if points == SPARKLINE_POINTS and sparkline is not None:
+                row['history'] = sparkline
+            else:
+                row['history'] = lttb(row['history'], points)
+    return results
+
+
+def snapshot_key(period, exchanges, sort_by):
+    return f"funding_table:{period}:{','.join(exchanges) or '*'}:{sort_by}"
+
+
+def build_funding_table(period, exchanges, sort_by):
+    """Группирует статистику тикеров по символу и сортирует: готовая таблица без пагинации"""
+    stats = TickerStats.objects.filter(period=period).select_related('ticker__exchange', 'ticker__asset')
+    if exchanges:
+        stats = stats.filter(ticker__exchange__name__in=exchanges)
+
+    grouped_data = {}
+    for st in stats:
+        t = st.ticker
+        row = {
+            'exchange': t.exchange.name,
+            'price': t.last_price,
+            'live_apr': float(st.live_apr),
+            'hist_apr': float(st.avg_apr),
+            'frequency': st.frequency,
+            'history': st.history,
+            'sparkline': st.sparkline,
+            'image': t.asset.image_url if t.asset else None,
+            'market_cap': t.asset.market_cap if t.asset else 0,
+            'volume': t.asset.volume_24h if t.asset else 0,
+        }
+        grouped_data.setdefault(t.symbol, []).append(row)
+
+    result = []
+    for symbol, rows in grouped_data.items():
+        aprs = [r['hist_apr'] for r in rows]
+        spread = max(aprs) - min(aprs) if len(aprs) > 1 else 0
+
+        result.append({
+            'symbol': symbol,
+            'asset_info': rows[0],
+            'spread': spread,
+            'exchanges_data': rows
+        })
+
+    result.sort(key=sort_key(sort_by))
+    return result
+
+
+def sort_key(sort_by):
+    """
+    Ключ порядка таблицы: по убыванию метрики, при равенстве - по символу.
+    Ключ уникален для строки, поэтому по нему же работает keyset-курсор.
+    """
+    if sort_by == 'market_cap':
+        metric = lambda x: x['asset_info']['market_cap'] or 0
+    elif sort_by == 'apr':
+        metric = lambda x: max([abs(r['live_apr']) for r in x['exchanges_data']])
+    else:
+        metric = lambda x: x['spread']
+    return lambda x: (-float(metric(x)), x['symbol'])
+
+
+def store_funding_table(period, exchanges, sort_by, version=None):
+    """Собирает таблицу и кладёт её в Redis с версией данных, на которой она собрана"""
+    if version is None:
+        version = get_data_version()
+    rows = build_funding_table(period, exchanges, sort_by)
+    payload = dumps({'version': version, 'rows': rows})
+
+    key = snapshot_key(period, exchanges, sort_by)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(key, zlib.compress(payload, SNAPSHOT_COMPRESSION_LEVEL), ex=SNAPSHOT_TTL)
+        pipe.delete(f"{key}:lock")
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Снапшот {key} не сохранён: {e}")
+    # Отдаём то же, что лежит в кэше, чтобы ответ не зависел от того, откуда он взят
+    return loads(payload)['rows']
+
+
+def _schedule_rebuild(key, period, exchanges, sort_by):
+    """Ставит одну фоновую пересборку на ключ; остальные запросы пока получают старый снапшот"""
+    try:
+        if not get_redis().set(f"{key}:lock", 1, nx=True, ex=REBUILD_LOCK_TTL):
+            return
+        current_app.send_task('scanner.tasks.rebuild_funding_table_task', args=(period, exchanges, sort_by))
+    except Exception as e:
+        # Без брокера пересоберёт следующий запрос после истечения блокировки
+        logger.warning(f"Пересборка {key} не запланирована: {e}")
+
+
+def get_funding_table(period, exchanges=(), sort_by=DEFAULT_SORT):
+    """
+    Сгруппированная и отсортированная таблица фандинга из снапшота в Redis (FundingTable).
+    Снапшот со старой версией данных отдаётся как есть, а пересборка уходит в Celery
+    (stale-while-revalidate); без Redis таблица собирается на месте.
+    """
+    period, exchanges, sort_by = normalize_params(period, exchanges, sort_by)
+    version = get_data_version()
+    if version is None:
+        return FundingTable(build_funding_table(period, exchanges, sort_by), None, False)
+
+    key = snapshot_key(period, exchanges, sort_by)
+    try:
+        cached = get_redis().get(key)
+        snapshot = loads(zlib.decompress(cached)) if cached is not None else None
+    except (redis.RedisError, zlib.error):
+        # zlib.error - несжатый снапшот старого формата: просто собираем заново
+        snapshot = None
+
+    if snapshot is None:
+        return FundingTable(store_funding_table(period, exchanges, sort_by, version), version, False)
+
+    stale = snapshot['version'] != version
+    if stale:
+        _schedule_rebuild(key, period, exchanges, sort_by)
+    return FundingTable(snapshot['rows'], snapshot['version'], stale)
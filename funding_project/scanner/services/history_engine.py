@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import queue
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# since - watermark тикера: качаем только записи новее него
+HistoryJob = namedtuple('HistoryJob', ['ticker_id', 'symbol', 'since'])
+
+_DONE = object()
+
+
+class HistoryFetchEngine:
+    """
+    Параллельная постраничная загрузка истории фандинга
+    с лимитом конкурентности на биржу.
+    """
+
+    # Сколько страниц может ждать записи в БД, дальше загрузка притормаживает
+    MAX_PENDING_PAGES = 64
+
+    # Как часто ждущий места в очереди поток проверяет, не остановлен ли движок
+    PUT_POLL_SECONDS = 0.5
+
+    def __init__(self, scanner, concurrency=None):
+        self.scanner = scanner
+        self.concurrency = concurrency or scanner.MAX_CONCURRENCY
+        # {symbol: ошибка} - история не получена (целиком или частично); skipped - не запрашивалась;
+        # crashed - упал сам движок
+        self.failed = {}
+        self.skipped = 0
+        self.crashed = None
+        self._stop = threading.Event()
+
+    def _put(self, results, item):
+        """put с проверкой остановки: потребитель мог уйти, и очередь больше не разбирается"""
+        while not self._stop.is_set():
+            try:
+                results.put(item, timeout=self.PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def _stream_one(self, semaphore, job, results):
+        async with semaphore:
+            if self._stop.is_set():
+                return
+            if self.scanner.breaker.is_open:
+                # Биржа лежит: не тратим время на символы, их подберёт следующий скан
+                self.skipped += 1
+                return
+            try:
+                async for page in self.scanner.aiter_funding_history(job.symbol, since=job.since):
+                    put = asyncio.get_running_loop().run_in_executor(
+                        self.scanner.transport.executor(), self._put, results, (job, page)
+                    )
+                    if not await put:
+                        return
+            except Exception as e:
+                logger.warning(f"{self.scanner.name}: история {job.symbol} не получена: {e}")
+                self.failed[job.symbol] = str(e) or e.__class__.__name__
+
+    def error_summary(self, total):
+        """Сводка сбоев загрузки для результата шарда; None - всё получено"""
+        if not self.failed and not self.skipped and not self.crashed:
+            return None
+        parts = [f"движок истории упал: {self.crashed}"] if self.crashed else []
+        if self.failed:
+            parts.append(f"история не получена по {len(self.failed)} из {total} символов: {next(iter(self.failed.values()))}")
+        if self.skipped:
+            parts.append(f"цепь разомкнута, пропущено {self.skipped} из {total} символов")
+        return '; '.join(parts)
+
+    async def run(self, jobs, results):
+        # Потоки берутся из пула транспорта, а не создаются на запуск: asyncio.run закрыл бы
+        # свой executor, и каждый шард заново открывал бы сессии и TLS-соединения
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._stream_one(semaphore, job, results) for job in jobs))
+        if self.skipped:
+            logger.warning(f"{self.scanner.name}: цепь разомкнута, пропущено {self.skipped} символов")
+
+    def iter_pages(self, jobs):
+        """
+        Синхронный итератор (job, page) в порядке прихода страниц.
+        Event loop крутится в отдельном потоке, поэтому вызывающий код
+        может спокойно писать в БД через ORM, пока идут запросы.
+        После обхода недополученное видно в failed и skipped.
+        """
+        results = queue.Queue(maxsize=self.MAX_PENDING_PAGES)
+
+        def worker():
+            try:
+                asyncio.run(self.run(jobs, results))
+            except Exception as e:
+                logger.error(f"{self.scanner.name}: движок истории упал: {e}")
+                self.crashed = str(e) or e.__class__.__name__
+            finally:
+                self._put(results, _DONE)
+
+        self._stop.clear()
+        self.failed = {}
+        self.skipped = 0
+        self.crashed = None
+        thread = threading.Thread(target=worker, name=f"history-{self.scanner.name}", daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Потребитель упал или закрыл генератор раньше: загрузчики бросают очередь
+            # и заканчивают после текущего запроса, а не висят на put вечно
+            self._stop.set()
+
+        thread.join()
@@ -0,0 +1,177 @@
+from collections import namedtuple
+import numpy as np
+from django.db.models import Max
+from django.utils import timezone
+from scanner.models import Asset, Ticker, FundingRate, HOURS_PER_YEAR, asset_symbol_for
+
+# Ставки с |APR| выше порога считаем мусором API
+MAX_ABS_APR = 2000
+
+# Итог записи ставок: rows - записано, inserted - из них новых строк,
+# last_timestamp - самая поздняя фактическая (не прогноз, не из будущего) ставка, unix time, или None
+StoredRates = namedtuple('StoredRates', ['rows', 'inserted', 'last_timestamp'])
+
+
+def resolve_assets(asset_symbols):
+    """Возвращает {symbol: asset_id}, создавая недостающие активы одним INSERT"""
+    asset_symbols = set(asset_symbols)
+    asset_ids = dict(Asset.objects.filter(symbol__in=asset_symbols).values_list('symbol', 'id'))
+
+    missing = asset_symbols - asset_ids.keys()
+    if missing:
+        Asset.objects.bulk_create([Asset(symbol=s) for s in missing], ignore_conflicts=True)
+        asset_ids.update(Asset.objects.filter(symbol__in=missing).values_list('symbol', 'id'))
+
+    return asset_ids
+
+
+def upsert_tickers(exchange_obj, market_data):
+    """
+    Массовый upsert тикеров биржи: INSERT ... ON CONFLICT (exchange, symbol) DO UPDATE.
+    Возвращает {symbol: ticker_id} для остального пайплайна.
+    """
+    # Один и тот же ряд нельзя обновить дважды в одном INSERT, последний выигрывает
+    items = {item['symbol']: item for item in market_data}
+    if not items:
+        return {}
+
+    asset_ids = resolve_assets(asset_symbol_for(symbol) for symbol in items)
+
+    Ticker.objects.bulk_create(
+        [
+            Ticker(
+                exchange=exchange_obj,
+                symbol=symbol,
+                original_symbol=item.get('original_symbol', symbol),
+                last_price=item['price'],
+                asset_id=asset_ids.get(asset_symbol_for(symbol)),
+            )
+            for symbol, item in items.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['exchange', 'symbol'],
+        # asset не перезаписываем: привязку могли поправить вручную
+        update_fields=['last_price', 'original_symbol'],
+    )
+
+    rows = Ticker.objects.filter(exchange=exchange_obj, symbol__in=items).values_list('symbol', 'id', 'asset_id')
+    # Актив ставим только тикерам, у которых его ещё нет
+    unlinked = [
+        Ticker(id=ticker_id, asset_id=asset_ids[asset_symbol_for(symbol)])
+        for symbol, ticker_id, asset_id in rows
+        if asset_id is None and asset_symbol_for(symbol) in asset_ids
+    ]
+    if unlinked:
+        Ticker.objects.bulk_update(unlinked, ['asset'])
+
+    return {symbol: ticker_id for symbol, ticker_id, _ in rows}
+
+
+def load_watermarks(exchange_obj):
+    """
+    {ticker_id: timestamp последней подтверждённой ставки} одним GROUP BY запросом.
+    Прогнозы снапшота в watermark не входят, даже когда их время уже прошло:
+    иначе история по ним никогда не докачается и прогноз не заменится фактом.
+    """
+    return dict(
+        FundingRate.objects.filter(ticker__exchange=exchange_obj, timestamp__lte=timezone.now(), predicted=False)
+        .order_by()
+        .values('ticker_id')
+        .annotate(last_ts=Max('timestamp'))
+        .values_list('ticker_id', 'last_ts')
+    )
+
+
+def build_funding_records(ticker_id, rows, since=None, predicted=False):
+    """
+    FundingRate для страницы строк истории новее since.
+    APR, отсев выбросов и дедупликация по timestamp считаются одним проходом numpy.
+    """
+    if not rows:
+        return []
+
+    timestamps = np.array([row['timestamp'].timestamp() for row in rows])
+    rates = np.array([float(row['rate']) for row in rows])
+    periods = np.array([row.get('period_hours', 1) for row in rows], dtype=float)
+
+    aprs = np.round(rates * HOURS_PER_YEAR / periods * 100, 4)
+
+    valid = np.abs(aprs) <= MAX_ABS_APR
+    if since is not None:
+        valid &= timestamps > since.timestamp()
+
+    # Из повторов одного timestamp берём первую валидную строку
+    idx = np.flatnonzero(valid)
+    _, first = np.unique(timestamps[idx], return_index=True)
+    idx = idx[np.sort(first)]
+
+    aprs = aprs.tolist()
+    periods = periods.astype(int).tolist()
+    return [
+        FundingRate(
+            ticker_id=ticker_id,
+            timestamp=rows[i]['timestamp'],
+            rate=rows[i]['rate'],
+            period_hours=periods[i],
+            apr=aprs[i],
+            predicted=predicted,
+        )
+        for i in idx.tolist()
+    ]
+
+
+def _upsert_rates(records, **existing_filter):
+    """
+    Upsert ставок по (ticker, timestamp). Новые строки - записанные минус ключи,
+    которые уже были в базе: их ищем только среди тикеров и времён пачки.
+    """
+    if not records:
+        return StoredRates(0, 0, None)
+
+    timestamps = [r.timestamp for r in records]
+    existing = set(FundingRate.objects.filter(
+        ticker_id__in={r.ticker_id for r in records},
+        timestamp__gte=min(timestamps),
+        timestamp__lte=max(timestamps),
+        **existing_filter,
+    ).values_list('ticker_id', 'timestamp'))
+    inserted = sum(1 for r in records if (r.ticker_id, r.timestamp) not in existing)
+
+    FundingRate.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['ticker', 'timestamp'],
+        update_fields=['rate', 'period_hours', 'apr', 'predicted'],
+    )
+    # Прогноз снапшота стоит на будущей выплате: в «последнее обновление» он не попадает
+    now = timezone.now()
+    settled = [r.timestamp for r in records if not r.predicted and r.timestamp <= now]
+    return StoredRates(len(records), inserted, max(settled).timestamp() if settled else None)
+
+
+def store_snapshot(ticker_ids, snapshot):
+    """
+    Записывает ставки снапшота биржи одним upsert.
+    Строка на время ближайшей выплаты - прогноз (predicted): обновляется каждым сканом,
+    а после выплаты её заменяет фактическая ставка из истории.
+    """
+    # Как и в upsert_tickers: на один тикер одна строка, последний выигрывает
+    latest = {}
+    for item in snapshot:
+        ticker_id = ticker_ids.get(item['symbol'])
+        if ticker_id:
+            latest[ticker_id] = item
+
+    records = []
+    for ticker_id, item in latest.items():
+        records.extend(build_funding_records(ticker_id, [item], predicted=True))
+    return _upsert_rates(records)
+
+
+def store_history(records):
+    """
+    Пишет страницы истории. Фактическая ставка перезаписывает прогноз снапшота
+    на то же время (и снимает флаг predicted), остальные строки просто добавляются.
+    История пишется только новее watermark, поэтому совпасть может лишь прогноз.
+    """
+    return _upsert_rates(records, predicted=True)
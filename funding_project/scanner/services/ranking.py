@@ -0,0 +1,185 @@
+import bisect
+import heapq
+import logging
+import zlib
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from itertools import islice
+import redis
+from scanner.models import TickerStats
+from scanner.renderers import dumps, loads
+from scanner.utils.cursor import InvalidCursor, decode_cursor, encode_cursor
+from scanner.utils.data_version import VersionedValue
+from scanner.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SIDES = ('SHORT', 'LONG')
+
+# Строки рейтинга, собранные в конце скана: процессы API читают их отсюда, а не из TickerStats
+RANKING_KEY = 'ranking:rows'
+# Параллельные finish_scan_task пишут по очереди: последняя запись видит статистику обоих сканов
+RANKING_LOCK_TIMEOUT = 120
+SNAPSHOT_COMPRESSION_LEVEL = 3
+
+Opportunity = namedtuple('Opportunity', ['yield_apr', 'symbol', 'exchange', 'side', 'price'])
+
+
+def rank_key(item):
+    """Порядок рейтинга: по убыванию |APR|, затем символ и биржа - как в курсоре API"""
+    return (-item.yield_apr, item.symbol, item.exchange)
+
+
+def _stream(items, start, reverse):
+    """Хвост партиции от позиции курсора в нужную сторону, без копирования списка"""
+    indexes = range(start - 1, -1, -1) if reverse else range(start, len(items))
+    return (items[i] for i in indexes)
+
+
+class OpportunityRanking:
+    """
+    Рейтинг тикеров по |средний APR| для каждого периода, заранее разложенный
+    на партиции (период, сторона, биржа). Запрос сливает нужные партиции через
+    heapq.merge и читает только первые page_size строк после курсора.
+    """
+
+    def __init__(self, rows):
+        # rows: (period, avg_apr, symbol, exchange_name, last_price)
+        self.partitions = defaultdict(list)
+        self.exchanges = defaultdict(set)
+        for period, avg_apr, symbol, exchange_name, last_price in rows:
+            if not avg_apr:
+                continue
+            side = 'SHORT' if avg_apr > 0 else 'LONG'
+            self.partitions[(period, side, exchange_name)].append(
+                Opportunity(abs(avg_apr), symbol, exchange_name, side, last_price)
+            )
+            self.exchanges[period].add(exchange_name)
+
+        for items in self.partitions.values():
+            items.sort(key=rank_key)
+
+    @classmethod
+    def build(cls):
+        """Рейтинг из снапшота в Redis; без снапшота или Redis - прямо из базы"""
+        try:
+            cached = get_redis().get(RANKING_KEY)
+            if cached is not None:
+                return cls(decode_rows(loads(zlib.decompress(cached))))
+        except (redis.RedisError, zlib.error) as e:
+            logger.warning(f"Снапшот рейтинга недоступен, рейтинг собирается по базе: {e}")
+            return cls(load_rows())
+
+        # Снапшота ещё нет (первый запуск): кладём собранный, если скан не успел раньше
+        rows = load_rows()
+        try:
+            _write_rows(rows, nx=True)
+        except redis.RedisError as e:
+            logger.warning(f"Снапшот рейтинга не сохранён: {e}")
+        return cls(rows)
+
+    def _selected(self, period, side, exchanges):
+        sides = (side,) if side in SIDES else SIDES
+        exchanges = exchanges or self.exchanges[period]
+        return [
+            self.partitions[(period, s, exchange)] for s in sides for exchange in exchanges
+            if (period, s, exchange) in self.partitions
+        ]
+
+    def page(self, period, side='ALL', exchanges=None, symbols=None, raw_cursor=None, page_size=30):
+        """
+        Страница рейтинга: (items, next_cursor, previous_cursor, count).
+        symbols - множество символов из поиска или None.
+        """
+        partitions = self._selected(period, side, exchanges)
+        matches = (lambda item: item.symbol in symbols) if symbols is not None else (lambda item: True)
+
+        reverse = False
+        streams = []
+        if raw_cursor:
+            raw_key, reverse = decode_cursor(raw_cursor, 3)
+            try:
+                cursor_apr = Decimal(raw_key[0])
+            except (ArithmeticError, TypeError, ValueError):
+                raise InvalidCursor('Invalid cursor')
+            # NaN не сравнивается с Decimal в bisect, а Infinity не бывает у настоящей строки
+            if not cursor_apr.is_finite():
+                raise InvalidCursor('Invalid cursor')
+            cursor_key = (-cursor_apr, str(raw_key[1]), str(raw_key[2]))
+
+        for items in partitions:
+            if not raw_cursor:
+                start = 0
+            elif reverse:
+                start = bisect.bisect_left(items, cursor_key, key=rank_key)
+            else:
+                start = bisect.bisect_right(items, cursor_key, key=rank_key)
+            streams.append(_stream(items, start, reverse))
+
+        merged = heapq.merge(*streams, key=rank_key, reverse=reverse)
+        found = list(islice(filter(matches, merged), page_size + 1))
+        has_more = len(found) > page_size
+        found = found[:page_size]
+        if reverse:
+            found.reverse()
+
+        more_after = has_more if not reverse else bool(raw_cursor)
+        more_before = bool(raw_cursor) if not reverse else has_more
+        key = lambda item: [str(item.yield_apr), item.symbol, item.exchange]
+        next_cursor = encode_cursor(key(found[-1])) if found and more_after else None
+        previous_cursor = encode_cursor(key(found[0]), reverse=True) if found and more_before else None
+
+        if symbols is None:
+            count = sum(len(items) for items in partitions)
+        else:
+            count = sum(1 for items in partitions for item in items if item.symbol in symbols)
+        return found, next_cursor, previous_cursor, count
+
+
+def load_rows():
+    return list(TickerStats.objects.values_list(
+        'period', 'avg_apr', 'ticker__symbol', 'ticker__exchange__name', 'ticker__last_price'
+    ).iterator(chunk_size=2000))
+
+
+def encode_rows(rows):
+    """Строки для JSON: Decimal строками, уже в порядке рейтинга - сортировка партиций потом почти бесплатна"""
+    rows = sorted(rows, key=lambda row: (-abs(row[1] or 0), row[2], row[3]))
+    return [
+        [period, str(avg_apr), symbol, exchange_name, str(last_price) if last_price is not None else None]
+        for period, avg_apr, symbol, exchange_name, last_price in rows
+    ]
+
+
+def decode_rows(rows):
+    return [
+        (period, Decimal(avg_apr), symbol, exchange_name, Decimal(last_price) if last_price is not None else None)
+        for period, avg_apr, symbol, exchange_name, last_price in rows
+    ]
+
+
+def _write_rows(rows, nx=False):
+    get_redis().set(RANKING_KEY, zlib.compress(dumps(encode_rows(rows)), SNAPSHOT_COMPRESSION_LEVEL), nx=nx)
+
+
+def store_ranking():
+    """
+    Снапшот строк рейтинга в Redis; вызывается в конце скана до смены версии данных,
+    поэтому каждый процесс API пересобирает рейтинг без запроса к базе.
+    """
+    try:
+        with get_redis().lock(f"{RANKING_KEY}:lock", timeout=RANKING_LOCK_TIMEOUT, blocking_timeout=RANKING_LOCK_TIMEOUT):
+            rows = load_rows()
+            _write_rows(rows)
+    except redis.RedisError as e:
+        logger.warning(f"Снапшот рейтинга не сохранён: {e}")
+        return 0
+    return len(rows)
+
+
+_ranking = VersionedValue(OpportunityRanking.build)
+
+
+def get_ranking():
+    """Рейтинг процесса; перечитывается из снапшота после каждого скана (по версии данных)"""
+    return _ranking.get()
@@ -0,0 +1,144 @@
+import logging
+import re
+import time
+from django.db import OperationalError, connection, transaction
+from django.utils.dateparse import parse_datetime
+from scanner.models import FundingRate, FundingRateHourly, FundingRateDaily
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+class FundingRetention:
+    """
+    Удаление устаревших ставок без долгих блокировок:
+    целиком истёкшие партиции (PostgreSQL) сначала отсоединяются от таблицы ставок
+    и только потом удаляются DROP TABLE, остальное удаляется пачками по первичному ключу с паузами.
+    """
+
+    BATCH_SIZE = 5000
+    PAUSE_SECONDS = 0.2
+    # Сколько ждать блокировку родительской таблицы при DETACH без CONCURRENTLY:
+    # дольше - и очередь за нашей блокировкой начнёт задерживать запись сканов
+    DETACH_LOCK_TIMEOUT = '2s'
+    DETACH_ATTEMPTS = 3
+
+    def __init__(self, batch_size=None, pause=None, progress=None):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.pause = self.PAUSE_SECONDS if pause is None else pause
+        # progress(deleted_so_far) вызывается после каждой партиции и пачки
+        self.progress = progress or (lambda deleted: None)
+
+    def purge(self, cutoff):
+        deleted = self.drop_expired_partitions(cutoff)
+        deleted += self.delete_expired_rows(cutoff, already_deleted=deleted)
+        self.delete_expired_rollups(cutoff)
+        return deleted
+
+    def delete_expired_rollups(self, cutoff):
+        # Бакетов на порядки меньше, чем ставок: хватает одного DELETE на таблицу
+        for model in (FundingRateHourly, FundingRateDaily):
+            model.objects.filter(bucket__lt=cutoff).delete()
+
+    def expired_partitions(self, cutoff):
+        """Партиции таблицы ставок, верхняя граница которых не позже cutoff"""
+        if connection.vendor != 'postgresql':
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [FundingRate._meta.db_table],
+            )
+            partitions = cursor.fetchall()
+
+        expired = []
+        for name, bound in partitions:
+            match = _PARTITION_UPPER_BOUND.search(bound or '')
+            upper = parse_datetime(match.group(1)) if match else None
+            if upper is not None and upper <= cutoff:
+                expired.append(name)
+        return expired
+
+    def _has_default_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s) AND partdefid <> 0",
+                [FundingRate._meta.db_table],
+            )
+            return cursor.fetchone() is not None
+
+    def detach_partition(self, name):
+        """
+        Отсоединяет партицию, не держа ACCESS EXCLUSIVE на таблице ставок.
+        DETACH ... CONCURRENTLY невозможен при DEFAULT-партиции и внутри транзакции:
+        тогда обычный DETACH с коротким lock_timeout и повторами. False - не удалось.
+        """
+        parent = connection.ops.quote_name(FundingRate._meta.db_table)
+        quoted = connection.ops.quote_name(name)
+        if not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = to_regclass(%s)", [name])
+                pending = cursor.fetchone()
+                if pending and pending[0]:
+                    # Прошлый DETACH CONCURRENTLY прервали на полпути
+                    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {quoted} FINALIZE")
+                    return True
+                if not self._has_default_partition():
+                    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {quoted} CONCURRENTLY")
+                    return True
+
+        for attempt in range(1, self.DETACH_ATTEMPTS + 1):
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(f"SET LOCAL lock_timeout = '{self.DETACH_LOCK_TIMEOUT}'")
+                    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {quoted}")
+                return True
+            except OperationalError as e:
+                logger.warning(f"RETENTION: партиция {name} не отсоединена (попытка {attempt}): {e}")
+                time.sleep(self.pause)
+        return False
+
+    def drop_expired_partitions(self, cutoff):
+        deleted = 0
+        for name in self.expired_partitions(cutoff):
+            quoted = connection.ops.quote_name(name)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {quoted}")
+                rows = cursor.fetchone()[0]
+            if not self.detach_partition(name):
+                # Строки партиции удалит пачками delete_expired_rows, пустая таблица уйдёт в следующий раз
+                continue
+            # Отсоединённая таблица - обычная: DROP не трогает блокировки таблицы ставок
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {quoted}")
+            deleted += rows
+            logger.info(f"RETENTION: партиция {name} удалена ({rows} записей)")
+            self.progress(deleted)
+        return deleted
+
+    def delete_expired_rows(self, cutoff, already_deleted=0):
+        deleted = already_deleted
+        expired = FundingRate.objects.filter(timestamp__lt=cutoff).order_by()
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                break
+
+            # Без сигналов и каскадов Django удаляет одним DELETE ... WHERE id IN (...), не загружая строки
+            batch_deleted, _ = FundingRate.objects.filter(pk__in=ids).delete()
+            deleted += batch_deleted
+            logger.info(f"RETENTION: удалено {deleted} записей старше {cutoff:%Y-%m-%d %H:%M}")
+            self.progress(deleted)
+
+            if len(ids) < self.batch_size:
+                break
+            time.sleep(self.pause)
+        return deleted - already_deleted
@@ -0,0 +1,124 @@
+import heapq
+from collections import namedtuple
+from datetime import timedelta, timezone as dt_timezone
+from scanner.models import FundingRate, FundingRateHourly, FundingRateDaily
+
+ROLLUP_BATCH_SIZE = 2000
+
+ROLLUP_FIELDS = ['apr_sum', 'apr_count', 'apr_min', 'apr_max', 'last_apr', 'last_timestamp', 'period_hours']
+
+# Окно статистики тикера, собранное из бакетов
+WindowStats = namedtuple('WindowStats', ['avg_apr', 'live_apr', 'frequency', 'history', 'last_timestamp'])
+
+
+def floor_hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(moment):
+    return floor_hour(moment).replace(hour=0)
+
+
+def _ceil(moment, floor, step):
+    start = floor(moment)
+    return start if start == moment else start + step
+
+
+def _accumulate(buckets, key, timestamp, apr, period_hours):
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = {
+            'apr_sum': apr, 'apr_count': 1, 'apr_min': apr, 'apr_max': apr,
+            'last_apr': apr, 'last_timestamp': timestamp, 'period_hours': period_hours,
+        }
+        return
+    bucket['apr_sum'] += apr
+    bucket['apr_count'] += 1
+    bucket['apr_min'] = min(bucket['apr_min'], apr)
+    bucket['apr_max'] = max(bucket['apr_max'], apr)
+    # Строки идут по возрастанию времени: последняя в бакете и есть актуальная
+    bucket['last_apr'] = apr
+    bucket['last_timestamp'] = timestamp
+    bucket['period_hours'] = period_hours
+
+
+def _upsert(model, buckets):
+    objs = [model(ticker_id=ticker_id, bucket=bucket, **values) for (ticker_id, bucket), values in buckets.items()]
+    for i in range(0, len(objs), ROLLUP_BATCH_SIZE):
+        model.objects.bulk_create(
+            objs[i:i + ROLLUP_BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=['ticker', 'bucket'],
+            update_fields=ROLLUP_FIELDS,
+        )
+
+
+def refresh_rollups(touched):
+    """
+    Пересчитывает часовые и дневные бакеты, задетые записью ставок.
+    touched - {ticker_id: самый ранний записанный timestamp}; бакеты считаются
+    заново целиком с начала суток, поэтому повторный вызов ничего не ломает.
+    """
+    by_day = {}
+    for ticker_id, since in touched.items():
+        by_day.setdefault(floor_day(since), []).append(ticker_id)
+
+    buckets_count = 0
+    for day, ticker_ids in by_day.items():
+        rows = FundingRate.objects.filter(
+            ticker_id__in=ticker_ids, timestamp__gte=day, apr__isnull=False
+        ).order_by('ticker_id', 'timestamp').values_list('ticker_id', 'timestamp', 'apr', 'period_hours')
+
+        hourly, daily = {}, {}
+        for ticker_id, timestamp, apr, period_hours in rows.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+            _accumulate(hourly, (ticker_id, floor_hour(timestamp)), timestamp, apr, period_hours)
+            _accumulate(daily, (ticker_id, floor_day(timestamp)), timestamp, apr, period_hours)
+
+        _upsert(FundingRateHourly, hourly)
+        _upsert(FundingRateDaily, daily)
+        buckets_count += len(hourly) + len(daily)
+
+    return buckets_count
+
+
+def window_stats(since, ticker_ids=None):
+    """
+    Статистика тикеров за окно от since до конца данных: {ticker_id: WindowStats}.
+    Целые сутки окна читаются из дневных бакетов, неполный первый день - из часовых.
+    """
+    day_start = _ceil(since, floor_day, timedelta(days=1))
+    hour_start = _ceil(since, floor_hour, timedelta(hours=1))
+
+    fields = ('ticker_id', 'bucket', 'apr_sum', 'apr_count', 'last_apr', 'last_timestamp', 'period_hours')
+    hourly = FundingRateHourly.objects.filter(bucket__gte=hour_start, bucket__lt=day_start)
+    daily = FundingRateDaily.objects.filter(bucket__gte=day_start)
+    if ticker_ids is not None:
+        hourly = hourly.filter(ticker_id__in=ticker_ids)
+        daily = daily.filter(ticker_id__in=ticker_ids)
+
+    # Внутри тикера часовые бакеты всегда раньше дневных, так что слияние сохраняет порядок времени
+    rows = heapq.merge(
+        hourly.order_by('ticker_id', 'bucket').values_list(*fields),
+        daily.order_by('ticker_id', 'bucket').values_list(*fields),
+        key=lambda row: row[0],
+    )
+
+    totals = {}
+    for ticker_id, bucket, apr_sum, apr_count, last_apr, last_timestamp, period_hours in rows:
+        total = totals.setdefault(ticker_id, {'sum': 0, 'count': 0, 'history': []})
+        total['sum'] += apr_sum
+        total['count'] += apr_count
+        total['history'].append(float(apr_sum / apr_count))
+        total['last'] = (last_apr, last_timestamp, period_hours)
+
+    stats = {}
+    for ticker_id, total in totals.items():
+        last_apr, last_timestamp, period_hours = total['last']
+        stats[ticker_id] = WindowStats(
+            avg_apr=total['sum'] / total['count'],
+            live_apr=last_apr,
+            frequency=round(24 / period_hours) if period_hours else 0,
+            history=total['history'],
+            last_timestamp=last_timestamp,
+        )
+    return stats
@@ -0,0 +1,192 @@
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+import redis
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from scanner.models import Exchange, FundingRate, Ticker
+from scanner.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Общие счётчики: total_coins, total_exchanges
+STATS_KEY = 'scanner:stats'
+# Имена бирж, по которым есть хэш scanner:exchange:<name>; SCARD - total_exchanges
+EXCHANGES_KEY = 'scanner:exchanges'
+# Все символы тикеров; SCARD - total_coins
+SYMBOLS_KEY = 'scanner:symbols'
+# last_success - последний скан без ошибок; last_rows, failed_shards - последний скан;
+# rows, tickers, last_timestamp - что лежит в базе (сканы ведут их инкрементально)
+EXCHANGE_KEY = 'scanner:exchange:{}'
+
+INT_FIELDS = ('total_coins', 'total_exchanges', 'last_rows', 'failed_shards', 'rows', 'tickers')
+TIME_FIELDS = ('last_success', 'last_timestamp')
+# Поля биржи, которых может не быть в хэше (ещё не было скана, ставки удалены)
+EMPTY_EXCHANGE = {
+    'tickers': 0, 'rows': 0, 'last_timestamp': None, 'last_success': None, 'last_rows': None, 'failed_shards': None,
+}
+
+
+def _totals():
+    return {
+        'total_coins': Ticker.objects.values('symbol').distinct().count(),
+        'total_exchanges': Exchange.objects.count(),
+    }
+
+
+def _row_counts():
+    """
+    {биржа: {'rows': ..., 'last_timestamp': ...}} одним GROUP BY.
+    rows - все строки, last_timestamp - последняя фактическая ставка (прогнозы стоят в будущем).
+    """
+    counts = FundingRate.objects.order_by().values('ticker__exchange__name').annotate(
+        rows=Count('id'), last=Max('timestamp', filter=Q(predicted=False, timestamp__lte=timezone.now()))
+    )
+    result = {}
+    for row in counts:
+        fields = result[row['ticker__exchange__name']] = {'rows': row['rows']}
+        if row['last'] is not None:
+            fields['last_timestamp'] = row['last'].timestamp()
+    return result
+
+
+def _store(pipe, totals, exchanges):
+    pipe.hset(STATS_KEY, mapping=totals)
+    for name, fields in exchanges.items():
+        pipe.sadd(EXCHANGES_KEY, name)
+        pipe.hset(EXCHANGE_KEY.format(name), mapping=fields)
+        if 'last_timestamp' not in fields:
+            # Все ставки биржи удалены очисткой
+            pipe.hdel(EXCHANGE_KEY.format(name), 'last_timestamp')
+
+
+def record_scan(exchange_name, rows_written, failed_shards=0, rows_inserted=0, last_timestamp=None, symbols=()):
+    """
+    Конец скана биржи: счётчики обновляются без запросов к базе.
+    rows растёт на число вставленных строк, last_timestamp - только вперёд,
+    монеты и биржи - мощности множеств в Redis. symbols - все символы биржи.
+    last_success двигается только если ни один шард истории не упал.
+    """
+    fields = {'last_rows': rows_written, 'failed_shards': failed_shards, 'tickers': len(symbols)}
+    if not failed_shards:
+        fields['last_success'] = time.time()
+    key = EXCHANGE_KEY.format(exchange_name)
+    try:
+        client = get_redis()
+        if not client.exists(SYMBOLS_KEY):
+            # Счётчиков ещё нет (первый скан, чистый Redis): один раз считаем всё по базе,
+            # вставленные этим сканом строки там уже учтены
+            refresh_row_counts()
+            rows_inserted = 0
+
+        pipe = client.pipeline()
+        pipe.sadd(EXCHANGES_KEY, exchange_name)
+        if symbols:
+            pipe.sadd(SYMBOLS_KEY, *symbols)
+        pipe.hset(key, mapping=fields)
+        pipe.hincrby(key, 'rows', rows_inserted)
+        pipe.hget(key, 'last_timestamp')
+        pipe.scard(SYMBOLS_KEY)
+        pipe.scard(EXCHANGES_KEY)
+        *_, stored_last, total_coins, total_exchanges = pipe.execute()
+
+        pipe = client.pipeline()
+        pipe.hset(STATS_KEY, mapping={'total_coins': total_coins, 'total_exchanges': total_exchanges})
+        # Значение из будущего - прогноз, записанный прежней версией: его заменяем
+        if last_timestamp is not None and (
+            stored_last is None or last_timestamp > float(stored_last) or float(stored_last) > time.time()
+        ):
+            pipe.hset(key, 'last_timestamp', last_timestamp)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, статистика {exchange_name} не обновлена: {e}")
+
+
+def refresh_row_counts():
+    """
+    Полный пересчёт по базе (после очистки): строки, последняя ставка, тикеры и монеты.
+    Заодно убирает из Redis биржи, которых в базе больше нет.
+    """
+    counts = _row_counts()
+    exchanges = {
+        name: {'tickers': tickers, 'rows': 0, **counts.get(name, {})}
+        for name, tickers in Exchange.objects.annotate(ticker_count=Count('tickers')).values_list('name', 'ticker_count')
+    }
+    symbols = list(Ticker.objects.order_by().values_list('symbol', flat=True).distinct())
+    try:
+        client = get_redis()
+        removed = {name.decode() for name in client.smembers(EXCHANGES_KEY)} - exchanges.keys()
+
+        pipe = client.pipeline()
+        if removed:
+            pipe.srem(EXCHANGES_KEY, *removed)
+            pipe.delete(*(EXCHANGE_KEY.format(name) for name in removed))
+        pipe.delete(SYMBOLS_KEY)
+        for i in range(0, len(symbols), 1000):
+            pipe.sadd(SYMBOLS_KEY, *symbols[i:i + 1000])
+        _store(pipe, {'total_coins': len(symbols), 'total_exchanges': len(exchanges)}, exchanges)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, счётчики строк не обновлены: {e}")
+
+
+def _parse(fields):
+    result = {}
+    for field, value in fields.items():
+        field = field.decode()
+        if field in INT_FIELDS:
+            result[field] = int(value)
+        elif field in TIME_FIELDS:
+            result[field] = datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    return result
+
+
+def _summary(totals, exchanges):
+    last_updates = [e['last_timestamp'] for e in exchanges if e.get('last_timestamp')]
+    return {
+        'total_coins': totals.get('total_coins', 0),
+        'total_exchanges': totals.get('total_exchanges', 0),
+        'last_update': max(last_updates) if last_updates else None,
+        'total_rows': sum(e.get('rows', 0) for e in exchanges),
+        'exchanges': sorted(exchanges, key=lambda e: e['name']),
+    }
+
+
+def compute_scanner_stats():
+    """Та же статистика прямо из базы: пока счётчиков в Redis нет или он недоступен"""
+    counts = _row_counts()
+    exchanges = []
+    for name, tickers in Exchange.objects.annotate(ticker_count=Count('tickers')).values_list('name', 'ticker_count'):
+        row = counts.get(name, {})
+        exchanges.append({
+            'name': name,
+            'tickers': tickers,
+            'rows': row.get('rows', 0),
+            'last_timestamp': datetime.fromtimestamp(row['last_timestamp'], tz=dt_timezone.utc) if 'last_timestamp' in row else None,
+            'last_success': None,
+            'last_rows': None,
+            'failed_shards': None,
+        })
+    return _summary(_totals(), exchanges)
+
+
+def get_scanner_stats():
+    """Счётчики главной страницы из Redis (два round-trip, без запросов к БД)"""
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.hgetall(STATS_KEY)
+        pipe.smembers(EXCHANGES_KEY)
+        totals, names = pipe.execute()
+        if not totals:
+            return compute_scanner_stats()
+
+        names = sorted(name.decode() for name in names)
+        pipe = client.pipeline()
+        for name in names:
+            pipe.hgetall(EXCHANGE_KEY.format(name))
+        exchanges = [{'name': name, **EMPTY_EXCHANGE, **_parse(fields)} for name, fields in zip(names, pipe.execute())]
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, статистика считается по базе: {e}")
+        return compute_scanner_stats()
+    return _summary(_parse(totals), exchanges)
@@ -0,0 +1,91 @@
+import bisect
+from collections import defaultdict
+from scanner.models import Ticker
+from scanner.utils.data_version import VersionedValue
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SymbolIndex:
+    """
+    Индекс символов в памяти процесса: отсортированный список для префиксов,
+    триграммы для подстрок (аналог icontains) и карта (биржа, символ) -> тикер.
+    """
+
+    def __init__(self, rows):
+        # rows: (ticker_id, symbol, original_symbol, exchange_name, asset_symbol, image_url)
+        # Поиск идёт по верхнему регистру, а наружу отдаются символы как в базе (kPEPE):
+        # по ним фильтруют symbol__in и сравнивают строки таблицы
+        self.exchanges = defaultdict(set)
+        self.assets = {}
+        self.variants = defaultdict(set)
+        self.tickers = {}
+        for ticker_id, symbol, original_symbol, exchange_name, asset_symbol, image_url in rows:
+            key = symbol.upper()
+            self.exchanges[symbol].add(exchange_name)
+            self.assets.setdefault(symbol, (asset_symbol, image_url))
+            self.variants[key].add(symbol)
+            for alias in (key, original_symbol.upper()):
+                self.tickers.setdefault((exchange_name.upper(), alias), ticker_id)
+
+        self.keys = sorted(self.variants)
+        self.trigrams = defaultdict(set)
+        for key in self.keys:
+            for gram in _trigrams(key):
+                self.trigrams[gram].add(key)
+
+    @classmethod
+    def build(cls):
+        return cls(Ticker.objects.values_list(
+            'id', 'symbol', 'original_symbol', 'exchange__name', 'asset__symbol', 'asset__image_url'
+        ).iterator(chunk_size=2000))
+
+    def _symbols(self, keys):
+        return [symbol for key in keys for symbol in sorted(self.variants[key])]
+
+    def prefix(self, query):
+        query = query.upper()
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + '\uffff')
+        return self._symbols(self.keys[start:end])
+
+    def contains(self, query):
+        """Символы, содержащие query (регистр не важен), в написании из базы"""
+        query = query.upper()
+        if len(query) < 3:
+            return set(self._symbols(key for key in self.keys if query in key))
+
+        grams = sorted((self.trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+        candidates = set.intersection(*grams) if grams else set()
+        return set(self._symbols(key for key in candidates if query in key))
+
+    def suggest(self, query, limit=10):
+        """Подсказки для поиска: сначала совпадения по префиксу, потом по подстроке"""
+        found = self.prefix(query)[:limit]
+        if len(found) < limit:
+            seen = set(found)
+            found += sorted((s for s in self.contains(query) if s not in seen), key=lambda s: (s.upper(), s))[:limit - len(found)]
+
+        suggestions = []
+        for symbol in found:
+            asset_symbol, image_url = self.assets[symbol]
+            suggestions.append({
+                'symbol': symbol,
+                'asset': asset_symbol,
+                'image': image_url,
+                'exchanges': sorted(self.exchanges[symbol]),
+            })
+        return suggestions
+
+    def ticker_id(self, exchange_name, symbol):
+        return self.tickers.get((exchange_name.upper(), symbol.upper()))
+
+
+_index = VersionedValue(SymbolIndex.build)
+
+
+def get_symbol_index():
+    """Индекс процесса; перестраивается, когда скан увеличил версию данных"""
+    return _index.get()
@@ -0,0 +1,135 @@
+import bisect
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Avg, Count, F, Q, Window
+from django.db.models.functions import Lead, RowNumber
+from django.utils import timezone
+from scanner.models import FundingRate, TickerStats
+from scanner.services.rollups import window_stats
+from scanner.utils.downsample import lttb
+
+# Окна статистики; live - последняя ставка. Значения 1h/4h совпадают с прежним days_map API
+STATS_PERIODS = {
+    'live': None,
+    '1h': timedelta(days=0.04),
+    '4h': timedelta(days=0.16),
+    '1d': timedelta(days=1),
+    '3d': timedelta(days=3),
+    '7d': timedelta(days=7),
+    '14d': timedelta(days=14),
+    '30d': timedelta(days=30),
+}
+DEFAULT_PERIOD = '1d'
+# Длинные окна считаются по часовым/дневным бакетам, короткие - по сырым ставкам
+ROLLUP_PERIODS = ('7d', '14d', '30d')
+RAW_WINDOW = timedelta(days=3)
+# Ширина спарклайна по умолчанию; она же хранится готовой в TickerStats.sparkline
+SPARKLINE_POINTS = 60
+
+APR_QUANT = Decimal('0.0001')
+
+
+def stats_period(period):
+    return period if period in STATS_PERIODS else DEFAULT_PERIOD
+
+
+def _frequency(latest, previous):
+    """Выплат в сутки по интервалу между двумя последними ставками"""
+    if previous is None:
+        return 0
+    hours = (latest - previous).total_seconds() / 3600
+    return round(24 / hours) if hours > 0 else 0
+
+
+def _raw_stats(ticker_ids, now):
+    """
+    Короткие окна по сырым ставкам. Средние считает база условными агрегатами,
+    последнюю ставку и интервал до предыдущей - оконными функциями; в Python
+    приходит только компактный поток (ticker_id, timestamp, apr) для истории.
+    """
+    starts = {
+        period: now - span for period, span in STATS_PERIODS.items()
+        if span is not None and period not in ROLLUP_PERIODS
+    }
+    rates = FundingRate.objects.filter(
+        ticker_id__in=ticker_ids, timestamp__gte=now - RAW_WINDOW, apr__isnull=False
+    ).order_by()
+
+    aggregates = {}
+    for period, start in starts.items():
+        aggregates[f'avg_{period}'] = Avg('apr', filter=Q(timestamp__gte=start))
+        aggregates[f'count_{period}'] = Count('id', filter=Q(timestamp__gte=start))
+    totals = {row['ticker_id']: row for row in rates.values('ticker_id').annotate(**aggregates)}
+
+    newest_first = {'partition_by': [F('ticker_id')], 'order_by': F('timestamp').desc()}
+    latest = {
+        ticker_id: (apr, timestamp, previous)
+        for ticker_id, apr, timestamp, previous in rates.annotate(
+            row_number=Window(RowNumber(), **newest_first),
+            previous_timestamp=Window(Lead('timestamp'), **newest_first),
+        ).filter(row_number=1).values_list('ticker_id', 'apr', 'timestamp', 'previous_timestamp')
+    }
+
+    series = {}
+    history = rates.order_by('ticker_id', 'timestamp').values_list('ticker_id', 'timestamp', 'apr')
+    for ticker_id, timestamp, apr in history.iterator(chunk_size=2000):
+        timestamps, aprs = series.setdefault(ticker_id, ([], []))
+        timestamps.append(timestamp)
+        aprs.append(float(apr))
+
+    for ticker_id, row in totals.items():
+        live_apr, latest_timestamp, previous = latest[ticker_id]
+        timestamps, aprs = series[ticker_id]
+        yield TickerStats(
+            ticker_id=ticker_id, period='live', avg_apr=live_apr, live_apr=live_apr,
+            frequency=_frequency(latest_timestamp, previous), history=[float(live_apr)],
+        )
+
+        for period, start in starts.items():
+            if not row[f'count_{period}']:
+                continue
+            in_window = previous is not None and previous >= start
+            yield TickerStats(
+                ticker_id=ticker_id, period=period, avg_apr=row[f'avg_{period}'], live_apr=live_apr,
+                frequency=_frequency(latest_timestamp, previous) if in_window else 0,
+                history=aprs[bisect.bisect_left(timestamps, start):],
+            )
+
+
+def refresh_ticker_stats(ticker_ids, now=None):
+    """Пересчитывает TickerStats всех периодов для тикеров; возвращает число записанных строк"""
+    now = now or timezone.now()
+    ticker_ids = list(ticker_ids)
+
+    stats = list(_raw_stats(ticker_ids, now))
+
+    for period in ROLLUP_PERIODS:
+        for ticker_id, window in window_stats(now - STATS_PERIODS[period], ticker_ids=ticker_ids).items():
+            stats.append(TickerStats(
+                ticker_id=ticker_id, period=period, avg_apr=window.avg_apr, live_apr=window.live_apr,
+                frequency=window.frequency, history=window.history,
+            ))
+
+    for row in stats:
+        row.avg_apr = Decimal(str(row.avg_apr)).quantize(APR_QUANT)
+        row.sparkline = lttb(row.history, SPARKLINE_POINTS)
+
+    if stats:
+        TickerStats.objects.bulk_create(
+            stats,
+            batch_size=2000,
+            update_conflicts=True,
+            unique_fields=['ticker', 'period'],
+            update_fields=['avg_apr', 'live_apr', 'frequency', 'history', 'sparkline', 'updated_at'],
+        )
+
+    # Тикер, у которого окно опустело, не должен висеть в списках со старыми цифрами
+    fresh = {}
+    for row in stats:
+        fresh.setdefault(row.period, []).append(row.ticker_id)
+    for period in STATS_PERIODS:
+        TickerStats.objects.filter(period=period, ticker_id__in=ticker_ids).exclude(
+            ticker_id__in=fresh.get(period, [])
+        ).delete()
+
+    return len(stats)
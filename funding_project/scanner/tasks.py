@@ -1,10 +1,22 @@
-from celery import shared_task
-from .models import Exchange, Ticker, FundingRate
+import logging
+from celery import shared_task, chord, group
+from .models import Exchange, FundingRate, Ticker
 from django.utils import timezone
-from datetime import timedelta
-from decimal import Decimal, getcontext
+from datetime import datetime, timedelta
+from decimal import getcontext
 from scanner.services.coingecko import CoinGeckoService
-import time
+from scanner.services.retention import FundingRetention
+from scanner.utils.partitions import ensure_partitions
+from scanner.services.history_engine import HistoryFetchEngine, HistoryJob
+from scanner.services.ingest import (
+    StoredRates, upsert_tickers, load_watermarks, build_funding_records, store_snapshot, store_history,
+)
+from scanner.services.rollups import refresh_rollups
+from scanner.services.ticker_stats import refresh_ticker_stats
+from scanner.services.funding_table import store_funding_table
+from scanner.services.ranking import store_ranking
+from scanner.services.scanner_stats import record_scan, refresh_row_counts
+from scanner.utils.data_version import bump_data_version
 
 getcontext().prec = 28
 
@@ -16,6 +28,17 @@ from .exchanges.kucoin import KucoinScanner
 from .exchanges.apex import ApexScanner
 from .exchanges.coinex import CoinexScanner
 
+# Глубина истории для тикеров, по которым ещё нет ни одной ставки
+BACKFILL_DAYS = 30
+# Сколько периодов выплат без данных считаем дырой, которую чинит история
+GAP_PERIODS = 2
+# Размер пачки bulk_create: память скана не растёт с числом символов и дней
+INGEST_BATCH_SIZE = 2000
+# Символов в одном шарде истории; шарды разбираются всеми процессами worker
+SCAN_SHARD_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
 SCANNERS = {
     'Bitget': BitgetScanner,
     'Hyperliquid': HyperliquidScanner,
@@ -27,83 +50,171 @@ SCANNERS = {
 }
 
 @shared_task
-def scan_exchange_task(exchange_name):
+def scan_exchange_task(exchange_name, mode='auto'):
+    """
+    Стадия тикеров: обновляет тикеры и снапшот, затем раздаёт историю шардам (chord).
+
+    mode='auto'    - если биржа умеет, текущий фандинг берётся одним снапшотом,
+                     а история по символам качается только для бэкфилла и дыр;
+    mode='history' - история по всем символам от их watermark.
+    """
     if exchange_name not in SCANNERS:
         return f"Сканер для {exchange_name} не найден"
     
     scanner = SCANNERS[exchange_name]()
-    market_data = scanner.fetch_tickers()
+
+    snapshot = []
+    if mode == 'auto' and scanner.SUPPORTS_SNAPSHOT:
+        snapshot = scanner.fetch_funding_snapshot()
+
+    market_data = snapshot or scanner.fetch_tickers()
     if not market_data:
         return f"{exchange_name}: Нет данных тикеров"
     
     exchange_obj, _ = Exchange.objects.get_or_create(name=exchange_name)
-    processed_count = 0
+    stored = StoredRates(0, 0, None)
+    original_symbols = {item['symbol']: item.get('original_symbol', item['symbol']) for item in market_data}
     
-    for item in market_data:
-        original_symbol = item.get('original_symbol', item['symbol'])
-        
-        ticker, _ = Ticker.objects.update_or_create(
-            exchange=exchange_obj,
-            symbol=item['symbol'],
-            defaults={
-                'last_price': item['price'],
-                'original_symbol': original_symbol 
-            }
-        )
-        
-        last_entry = FundingRate.objects.filter(ticker=ticker).order_by('-timestamp').first()
-        lookback = 1 if last_entry else 30
-        
-        history = scanner.fetch_funding_history(original_symbol, lookback_days=lookback)
-        
-        existing_ts = set(FundingRate.objects.filter(
-            ticker=ticker, 
-            timestamp__gte=timezone.now() - timedelta(days=lookback + 1)
-        ).values_list('timestamp', flat=True))
-
-        new_records = []
-        for row in history:
-            if row['timestamp'] in existing_ts:
-                continue
-                
-            rate = Decimal(str(row['rate']))
-            period = Decimal(str(row.get('period_hours', 1)))
-            
-            apr_val = rate * (Decimal('24') / period) * Decimal('365') * Decimal('100')
-            
-            if abs(apr_val) > Decimal('2000'):
+    ticker_ids = upsert_tickers(exchange_obj, market_data)
+    watermarks = load_watermarks(exchange_obj)
+    now = timezone.now()
+    backfill_since = now - timedelta(days=BACKFILL_DAYS)
+
+    if snapshot:
+        stored = store_snapshot(ticker_ids, snapshot)
+        # Строки снапшота стоят на ближайшей выплате, то есть не раньше текущих суток
+        refresh_rollups(dict.fromkeys(ticker_ids.values(), now))
+        periods = {item['symbol']: item['period_hours'] for item in snapshot}
+
+    jobs = []
+    for symbol, ticker_id in ticker_ids.items():
+        since = watermarks.get(ticker_id)
+        if snapshot and since is not None:
+            # Снапшот покрывает текущую выплату; история нужна только если пропущено больше одной
+            if since >= now - timedelta(hours=GAP_PERIODS * periods[symbol]):
                 continue
+        jobs.append((ticker_id, original_symbols[symbol], (since or backfill_since).isoformat()))
+
+    if not jobs:
+        return finish_scan_task([], exchange_name, stored._asdict())
+
+    shards = [jobs[i:i + SCAN_SHARD_SIZE] for i in range(0, len(jobs), SCAN_SHARD_SIZE)]
+    chord(
+        group(scan_shard_task.s(exchange_name, shard) for shard in shards)
+    )(finish_scan_task.s(exchange_name, stored._asdict()))
+
+    return f"{exchange_name}: снапшот {stored.rows} записей, история по {len(jobs)} символам в {len(shards)} шардах"
+
+
+@shared_task
+def scan_shard_task(exchange_name, jobs):
+    """Качает историю для части символов биржи; jobs - [(ticker_id, symbol, since_iso), ...]"""
+    scanner = SCANNERS[exchange_name]()
+    jobs = [HistoryJob(ticker_id, symbol, datetime.fromisoformat(since)) for ticker_id, symbol, since in jobs]
+
+    totals = {'rows': 0, 'inserted': 0, 'last_timestamp': None}
+    pending = []
+    touched = {}
+    error = None
+    try:
+        engine = HistoryFetchEngine(scanner)
+        for job, page in engine.iter_pages(jobs):
+            records = build_funding_records(job.ticker_id, page, since=job.since)
+            if records:
+                earliest = min(r.timestamp for r in records)
+                touched[job.ticker_id] = min(touched.get(job.ticker_id, earliest), earliest)
+            pending.extend(records)
+
+            if len(pending) >= INGEST_BATCH_SIZE:
+                _add_stored(totals, store_history(pending))
+                pending = []
+
+        if pending:
+            _add_stored(totals, store_history(pending))
+        # Сбой запроса к бирже - тоже неуспешный шард, даже если всё полученное записано
+        error = engine.error_summary(len(jobs))
+        if error:
+            logger.error(f"{exchange_name}: шард из {len(jobs)} символов: {error}")
+    except Exception as e:
+        # Chord не роняем, чтобы записанное остальными шардами попало в статистику,
+        # но сбой возвращаем явно: finish_scan_task не засчитает такой скан как успешный.
+        # Недокачанное подберёт следующий скан по watermark.
+        logger.error(f"{exchange_name}: шард из {len(jobs)} символов упал: {e}")
+        error = str(e) or e.__class__.__name__
+
+    if touched:
+        refresh_rollups(touched)
+
+    return {**totals, 'error': error}
+
+
+def _add_stored(totals, stored):
+    """Добавляет StoredRates пачки к итогам шарда (dict, чтобы уйти в chord как JSON)"""
+    totals['rows'] += stored.rows
+    totals['inserted'] += stored.inserted
+    if stored.last_timestamp is not None and (totals['last_timestamp'] is None or stored.last_timestamp > totals['last_timestamp']):
+        totals['last_timestamp'] = stored.last_timestamp
 
-            new_records.append(FundingRate(
-                ticker=ticker,
-                timestamp=row['timestamp'],
-                rate=rate,
-                period_hours=float(period),
-                apr=apr_val.quantize(Decimal("0.0001"))
-            ))
-            existing_ts.add(row['timestamp'])
-        
-        if new_records:
-            FundingRate.objects.bulk_create(new_records, ignore_conflicts=True)
-            processed_count += len(new_records)
-        
-        if exchange_name == 'Paradex':
-            time.sleep(0.5) 
-        else:
-            time.sleep(0.1)
-            
-    return f"{exchange_name}: Успешно обновлено {processed_count} записей"
 
 @shared_task
-def cleanup_old_data_task(days=30):
+def finish_scan_task(shard_results, exchange_name, snapshot=None):
+    """
+    Сводит результаты шардов одного скана и пересчитывает статистику тикеров биржи.
+    snapshot - StoredRates._asdict() записи снапшота.
+    """
+    results = [*shard_results, snapshot or StoredRates(0, 0, None)._asdict()]
+    processed_count = sum(result['rows'] for result in results)
+    last_timestamps = [result['last_timestamp'] for result in results if result['last_timestamp'] is not None]
+    failed = [result['error'] for result in shard_results if result['error']]
+
+    tickers = list(Ticker.objects.filter(exchange__name=exchange_name).values_list('id', 'symbol'))
+    refresh_ticker_stats([ticker_id for ticker_id, _ in tickers])
+    record_scan(
+        exchange_name, processed_count, failed_shards=len(failed),
+        rows_inserted=sum(result['inserted'] for result in results),
+        last_timestamp=max(last_timestamps, default=None),
+        symbols=[symbol for _, symbol in tickers],
+    )
+    store_ranking()
+    bump_data_version()
+    if failed:
+        logger.error(f"{exchange_name}: скан завершён с ошибками, упало {len(failed)} из {len(shard_results)} шардов: {failed[0]}")
+        return f"{exchange_name}: обновлено {processed_count} записей, упало {len(failed)} из {len(shard_results)} шардов"
+    return f"{exchange_name}: Успешно обновлено {processed_count} записей"
+
+
+@shared_task(bind=True)
+def cleanup_old_data_task(self, days=30):
     cutoff_date = timezone.now() - timedelta(days=days)
+
+    def report(deleted):
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta={'deleted': deleted})
     
-    deleted_count, _ = FundingRate.objects.filter(timestamp__lt=cutoff_date).delete()
+    deleted_count = FundingRetention(progress=report).purge(cutoff_date)
+    if deleted_count:
+        refresh_row_counts()
+        bump_data_version()
     
     print(f"CLEANUP: Удалено {deleted_count} устаревших записей (старше {days} дней).")
     return deleted_count
 
 
+@shared_task
+def rebuild_funding_table_task(period, exchanges, sort_by):
+    """Фоновая пересборка снапшота таблицы фандинга после смены версии данных"""
+    rows = store_funding_table(period, exchanges, sort_by)
+    return f"Снапшот {period}/{','.join(exchanges) or '*'}/{sort_by}: {len(rows)} символов"
+
+
+@shared_task
+def ensure_partitions_task():
+    created = ensure_partitions()
+    if created:
+        print(f"PARTITIONS: Созданы партиции {', '.join(created)}")
+    return len(created)
+
+
 @shared_task
 def update_coingecko_data_task():
     service = CoinGeckoService()
@@ -1,3 +1,720 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import redis
+import requests
+from django.test import SimpleTestCase, TestCase
+from rest_framework.renderers import JSONRenderer
+from django.utils import timezone
+
+from funding_project.celery import app as celery_app
+from scanner import api_views, tasks
+from scanner.exchanges.base import (
+    MAX_RETRY_WAIT, BaseScanner, FundingIntervalCache, HttpTransport, _backoff_wait, _is_retryable,
+)
+from scanner.exchanges.binance import BinanceScanner
+from scanner.exchanges.bitget import BitgetScanner
+from scanner.models import Exchange, FundingRate, Ticker, TickerStats, calculate_apr
+from scanner.renderers import ORJSONRenderer, dumps, loads, orjson
+from scanner.services import funding_table, ranking, symbol_index
+from scanner.services.history_engine import HistoryFetchEngine, HistoryJob
+from scanner.services.ingest import MAX_ABS_APR, StoredRates, build_funding_records, store_history, store_snapshot
+from scanner.services.scanner_stats import get_scanner_stats
+from scanner.utils import data_version, redis_client
+from scanner.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from scanner.utils.cursor import InvalidCursor, decode_cursor, encode_cursor, paginate_sorted
+from scanner.utils.downsample import lttb
+
+T0 = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+
+
+def reference_records(rows, since=None):
+    """Прежний построчный расчёт на Decimal: эталон для numpy-версии"""
+    seen = set()
+    result = []
+    for row in rows:
+        if (since is not None and row['timestamp'] <= since) or row['timestamp'] in seen:
+            continue
+        apr = calculate_apr(row['rate'], row.get('period_hours', 1))
+        if abs(apr) > MAX_ABS_APR:
+            continue
+        result.append((row['timestamp'], apr))
+        seen.add(row['timestamp'])
+    return result
+
+
+class BuildFundingRecordsTests(SimpleTestCase):
+    def rows(self):
+        rates = ['0.0001', '-0.000375', '0.00001234', '0.00125', '-0.0000005', '0.5', '0.00003333']
+        periods = [8, 8, 1, 4, 1, 8, 1]
+        return [
+            {'timestamp': T0 + timedelta(hours=i), 'rate': Decimal(rate), 'period_hours': period}
+            for i, (rate, period) in enumerate(zip(rates, periods))
+        ]
+
+    def assertMatchesReference(self, rows, since=None):
+        records = build_funding_records(7, rows, since=since)
+        actual = [(r.timestamp, Decimal(str(r.apr)).quantize(Decimal('0.0001'))) for r in records]
+        self.assertEqual(actual, reference_records(rows, since=since))
+        return records
+
+    def test_apr_matches_decimal_formula(self):
+        records = self.assertMatchesReference(self.rows())
+        self.assertTrue(all(r.ticker_id == 7 and not r.predicted for r in records))
+
+    def test_outliers_are_dropped(self):
+        records = self.assertMatchesReference(self.rows())
+        # 0.5 за 8 часов - 54750% APR, выше MAX_ABS_APR
+        self.assertNotIn(T0 + timedelta(hours=5), [r.timestamp for r in records])
+
+    def test_since_is_exclusive(self):
+        rows = self.rows()
+        records = self.assertMatchesReference(rows, since=rows[2]['timestamp'])
+        self.assertEqual(records[0].timestamp, rows[3]['timestamp'])
+
+    def test_duplicates_keep_first_valid_row(self):
+        rows = self.rows()
+        rows.insert(1, {'timestamp': rows[0]['timestamp'], 'rate': Decimal('0.9'), 'period_hours': 8})
+        rows.insert(0, {'timestamp': rows[0]['timestamp'], 'rate': Decimal('9'), 'period_hours': 1})
+        records = self.assertMatchesReference(rows)
+        self.assertEqual(records[0].rate, Decimal('0.0001'))
+
+    def test_empty_page(self):
+        self.assertEqual(build_funding_records(1, []), [])
+
+    def test_bitget_history_is_floored_to_the_hour(self):
+        scanner = BitgetScanner()
+        scanner._intervals = FundingIntervalCache()
+        scanner._intervals.set({'AUSDT': 4})
+        funding_ms = lambda moment: str(int(moment.timestamp() * 1000))
+        now = datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        page = {'data': [
+            {'fundingTime': funding_ms(now - timedelta(hours=4) + timedelta(seconds=3)), 'fundingRate': '0.0001'},
+            {'fundingTime': funding_ms(now - timedelta(hours=4)), 'fundingRate': '0.0002'},
+            {'fundingTime': funding_ms(now - timedelta(hours=8, minutes=-1)), 'fundingRate': '0.0003'},
+        ]}
+        with mock.patch.object(scanner, '_get', side_effect=[page, {'data': []}]):
+            rows = [row for batch in scanner.iter_funding_history('AUSDT', lookback_days=1) for row in batch]
+
+        self.assertEqual([r['timestamp'] for r in rows], [now - timedelta(hours=4), now - timedelta(hours=8)])
+        self.assertEqual([r['rate'] for r in rows], [Decimal('0.0001'), Decimal('0.0003')])
+        self.assertEqual({r['period_hours'] for r in rows}, {4})
+
+        records = build_funding_records(1, rows)
+        self.assertEqual([r.timestamp for r in records], [r['timestamp'] for r in rows])
+
+
+class EndlessScanner(BaseScanner):
+    """Сканер без сети: бесконечная история по любому символу"""
+    MAX_CONCURRENCY = 2
+
+    def __init__(self):
+        super().__init__("TestEndless")
+
+    def iter_funding_history(self, symbol, since=None, lookback_days=30):
+        while True:
+            yield [{'timestamp': T0, 'rate': Decimal('0.0001'), 'period_hours': 1}]
+
+
+class HistoryEngineTests(SimpleTestCase):
+    def assert_engine_stopped(self):
+        # Поток event loop завершается только после всех загрузчиков; потоки пула транспорта остаются
+        deadline = time.monotonic() + 5
+        while any(t.name == 'history-TestEndless' for t in threading.enumerate()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(any(t.name == 'history-TestEndless' for t in threading.enumerate()))
+
+    def test_scanner_without_history_methods_fails_clearly(self):
+        class NoHistory(BaseScanner):
+            def __init__(self):
+                super().__init__("TestNoHistory")
+
+        with self.assertRaisesMessage(NotImplementedError, 'NoHistory'):
+            NoHistory().fetch_funding_history('AAA')
+
+    def test_pages_arrive_for_every_job(self):
+        class FewPages(EndlessScanner):
+            def iter_funding_history(self, symbol, since=None, lookback_days=30):
+                for i in range(3):
+                    yield [{'timestamp': T0 + timedelta(hours=i), 'rate': Decimal('0.0001')}]
+
+        jobs = [HistoryJob(i, f"S{i}", None) for i in range(5)]
+        pages = list(HistoryFetchEngine(FewPages()).iter_pages(jobs))
+        self.assertEqual(len(pages), 15)
+        self.assertEqual({job.ticker_id for job, _ in pages}, set(range(5)))
+
+    def test_sessions_are_reused_across_runs(self):
+        class HttpScanner(EndlessScanner):
+            def iter_funding_history(self, symbol, since=None, lookback_days=30):
+                yield [{'timestamp': T0, 'rate': Decimal(str(self._get('https://history.test/funding')['rate']))}]
+
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'rate': '0.0001'}
+        transport = HttpTransport(max_per_host=2)
+        scanner = HttpScanner()
+        scanner.transport = transport
+
+        with mock.patch.object(requests.Session, 'request', return_value=response), \
+                mock.patch.object(transport, '_new_session', wraps=transport._new_session) as new_session:
+            for _ in range(4):
+                pages = list(HistoryFetchEngine(scanner).iter_pages([HistoryJob(i, f"S{i}", None) for i in range(3)]))
+                self.assertEqual(len(pages), 3)
+
+        # Не больше сессии на поток пула, а не новые на каждый запуск
+        self.assertLessEqual(new_session.call_count, transport.max_per_host * 2)
+
+    def test_open_breaker_is_reported(self):
+        engine = HistoryFetchEngine(EndlessScanner())
+        with mock.patch.object(CircuitBreaker, 'is_open', new_callable=mock.PropertyMock, return_value=True):
+            pages = list(engine.iter_pages([HistoryJob(i, f"S{i}", None) for i in range(3)]))
+
+        self.assertEqual(pages, [])
+        self.assertEqual(engine.skipped, 3)
+        self.assertIn('пропущено 3 из 3', engine.error_summary(3))
+
+    def test_early_stop_releases_producers(self):
+        engine = HistoryFetchEngine(EndlessScanner())
+        engine.MAX_PENDING_PAGES = 2
+        engine.PUT_POLL_SECONDS = 0.05
+
+        pages = engine.iter_pages([HistoryJob(i, f"S{i}", None) for i in range(4)])
+        next(pages)
+        pages.close()
+
+        self.assert_engine_stopped()
+
+    def test_consumer_error_releases_producers(self):
+        engine = HistoryFetchEngine(EndlessScanner())
+        engine.PUT_POLL_SECONDS = 0.05
+
+        with self.assertRaises(RuntimeError):
+            for _ in engine.iter_pages([HistoryJob(1, "S1", None)]):
+                raise RuntimeError("запись в БД упала")
+
+        self.assert_engine_stopped()
+
+
+class FundingIntervalCacheTests(SimpleTestCase):
+    FUNDING_INFO = [{'symbol': 'AAAUSDT', 'fundingIntervalHours': 4}, {'symbol': 'BBBUSDT', 'fundingIntervalHours': 1}]
+
+    def setUp(self):
+        patcher = mock.patch.object(BinanceScanner, '_intervals', FundingIntervalCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_request_per_process(self):
+        def slow_get(url, params=None, weight=1):
+            time.sleep(0.05)
+            return self.FUNDING_INFO
+
+        with mock.patch.object(BinanceScanner, '_get', side_effect=slow_get) as get:
+            # Как шарды и потоки движка: несколько сканеров, одновременные вызовы
+            scanners = [BinanceScanner() for _ in range(3)]
+            results = []
+            threads = [
+                threading.Thread(target=lambda sc=sc: results.append(sc._funding_interval('AAAUSDT')))
+                for sc in scanners for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(results, [4] * 9)
+            self.assertEqual(BinanceScanner()._funding_interval('CCCUSDT'), BinanceScanner.DEFAULT_FUNDING_HOURS)
+        self.assertEqual(get.call_count, 1)
+
+    def test_failure_without_intervals_raises(self):
+        with mock.patch.object(BinanceScanner, '_get', side_effect=requests.ConnectionError("down")):
+            with self.assertRaises(requests.ConnectionError):
+                BinanceScanner()._funding_interval('BBBUSDT')
+
+    def test_failure_keeps_previous_intervals(self):
+        BinanceScanner._intervals.set({'BBBUSDT': 1})
+        BinanceScanner._intervals._expires_at = 0
+        with mock.patch.object(BinanceScanner, '_get', side_effect=requests.ConnectionError("down")) as get:
+            self.assertEqual(BinanceScanner()._funding_interval('BBBUSDT'), 1)
+            self.assertEqual(BinanceScanner()._funding_interval('BBBUSDT'), 1)
+        # Следующая попытка - не раньше RETRY_AFTER_FAILURE
+        self.assertEqual(get.call_count, 1)
+
+
+class HourlyScanner(BaseScanner):
+    """Сканер без сети: три символа, почасовая история за последние сутки"""
+    SYMBOLS = ('AAA', 'BBB', 'CCC')
+
+    def __init__(self):
+        super().__init__("TestHourly")
+
+    def fetch_tickers(self):
+        return [{'symbol': s, 'original_symbol': f"{s}USDT", 'price': Decimal('1')} for s in self.SYMBOLS]
+
+    def fetch_funding_history(self, symbol, since=None, lookback_days=30):
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        return [
+            {'timestamp': now - timedelta(hours=h), 'rate': Decimal('0.00001'), 'period_hours': 1}
+            for h in range(24)
+        ]
+
+
+class ScanChordTests(TestCase):
+    """Скан биржи: тикеры, chord из шардов истории и finish_scan_task (Celery в eager-режиме, без Redis)"""
+
+    def setUp(self):
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', eager)
+
+        # Недоступный Redis: все кэши и счётчики уходят в свои запасные ветки
+        for patcher in (
+            mock.patch.object(redis_client, '_client', redis.Redis(port=1, socket_connect_timeout=0.1)),
+            mock.patch.dict(tasks.SCANNERS, {'TestHourly': HourlyScanner}),
+            mock.patch.object(tasks, 'SCAN_SHARD_SIZE', 1),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assert_recorded(self, record_scan, rows, inserted, failed):
+        record_scan.assert_called_once()
+        args, kwargs = record_scan.call_args
+        self.assertEqual(args, ('TestHourly', rows))
+        self.assertEqual(kwargs['failed_shards'], failed)
+        self.assertEqual(kwargs['rows_inserted'], inserted)
+        self.assertEqual(sorted(kwargs['symbols']), list(HourlyScanner.SYMBOLS))
+        last = FundingRate.objects.filter(ticker__exchange__name='TestHourly').latest('timestamp').timestamp
+        self.assertEqual(kwargs['last_timestamp'], last.timestamp())
+
+    def test_history_fans_out_into_shards(self):
+        with mock.patch.object(tasks, 'record_scan') as record_scan:
+            result = tasks.scan_exchange_task('TestHourly', 'history')
+
+        self.assertIn('3 шардах', result)
+        self.assertEqual(FundingRate.objects.filter(ticker__exchange__name='TestHourly').count(), 72)
+        self.assert_recorded(record_scan, 72, inserted=72, failed=0)
+
+        # Повторный скан идёт от watermark и ничего не дублирует
+        tasks.scan_exchange_task('TestHourly', 'history')
+        self.assertEqual(FundingRate.objects.filter(ticker__exchange__name='TestHourly').count(), 72)
+
+    def test_failed_shard_is_reported(self):
+        store_history = tasks.store_history
+        calls = []
+
+        def flaky_store(records):
+            calls.append(len(records))
+            if len(calls) == 2:
+                raise RuntimeError("database is locked")
+            return store_history(records)
+
+        with mock.patch.object(tasks, 'store_history', side_effect=flaky_store), \
+                mock.patch.object(tasks, 'record_scan') as record_scan:
+            tasks.scan_exchange_task('TestHourly', 'history')
+
+        self.assert_recorded(record_scan, 48, inserted=48, failed=1)
+        self.assertEqual(Ticker.objects.filter(exchange__name='TestHourly').count(), 3)
+
+    def test_failed_history_requests_fail_the_shard(self):
+        class DownScanner(HourlyScanner):
+            def iter_funding_history(self, symbol, since=None, lookback_days=30):
+                raise requests.ConnectionError("connection refused")
+                yield
+
+        with mock.patch.dict(tasks.SCANNERS, {'TestHourly': DownScanner}), \
+                mock.patch.object(tasks, 'record_scan') as record_scan:
+            result = tasks.scan_shard_task('TestHourly', [(1, 'AAAUSDT', T0.isoformat()), (2, 'BBBUSDT', T0.isoformat())])
+            self.assertIn('история не получена по 2 из 2', result['error'])
+            self.assertEqual(result['rows'], 0)
+
+            message = tasks.scan_exchange_task('TestHourly', 'history')
+
+        self.assertIn('3 шардах', message)
+        self.assertEqual(record_scan.call_args.kwargs['failed_shards'], 3)
+
+    def test_finish_reports_failures(self):
+        shard_results = [
+            {'rows': 10, 'inserted': 7, 'last_timestamp': 1000.0, 'error': None},
+            {'rows': 0, 'inserted': 0, 'last_timestamp': None, 'error': 'boom'},
+        ]
+        snapshot = {'rows': 5, 'inserted': 1, 'last_timestamp': 2000.0}
+        with mock.patch.object(tasks, 'record_scan') as record_scan:
+            message = tasks.finish_scan_task(shard_results, 'TestHourly', snapshot)
+
+        record_scan.assert_called_once_with(
+            'TestHourly', 15, failed_shards=1, rows_inserted=8, last_timestamp=2000.0, symbols=[],
+        )
+        self.assertIn('упало 1 из 2', message)
+
+
+class StoredRatesTests(TestCase):
+    def test_only_new_rows_are_counted_as_inserted(self):
+        ticker = Ticker.objects.create(
+            exchange=Exchange.objects.create(name='Alpha'), symbol='AAA', original_symbol='AAAUSDT',
+        )
+        later = T0 + timedelta(hours=8)
+        prediction = [{'symbol': 'AAA', 'timestamp': T0, 'rate': Decimal('0.0001'), 'period_hours': 8}]
+
+        # Прогноз - не фактическая ставка: last_timestamp он не двигает
+        self.assertEqual(store_snapshot({'AAA': ticker.id}, prediction), StoredRates(1, 1, None))
+        # Тот же прогноз следующим сканом - обновление, а не новая строка
+        self.assertEqual(store_snapshot({'AAA': ticker.id}, prediction), StoredRates(1, 0, None))
+
+        records = build_funding_records(ticker.id, [
+            {'timestamp': T0, 'rate': Decimal('0.0002'), 'period_hours': 8},
+            {'timestamp': later, 'rate': Decimal('0.0001'), 'period_hours': 8},
+        ])
+        self.assertEqual(store_history(records), StoredRates(2, 1, later.timestamp()))
+        self.assertEqual(FundingRate.objects.filter(ticker=ticker, predicted=False).count(), 2)
+
+    def test_future_prediction_is_not_last_update(self):
+        ticker = Ticker.objects.create(
+            exchange=Exchange.objects.create(name='Alpha'), symbol='AAA', original_symbol='AAAUSDT',
+        )
+        settled = timezone.now().replace(minute=0, second=0, microsecond=0)
+        store_history(build_funding_records(ticker.id, [{'timestamp': settled, 'rate': Decimal('0.0001'), 'period_hours': 8}]))
+        stored = store_snapshot({'AAA': ticker.id}, [
+            {'symbol': 'AAA', 'timestamp': settled + timedelta(hours=8), 'rate': Decimal('0.0001'), 'period_hours': 8},
+        ])
+        self.assertIsNone(stored.last_timestamp)
+
+        with mock.patch.object(redis_client, '_client', redis.Redis(port=1, socket_connect_timeout=0.1)):
+            stats = get_scanner_stats()
+        self.assertEqual(stats['total_rows'], 2)
+        self.assertEqual(stats['last_update'], settled)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('scanner.utils.circuit_breaker.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', window=10, min_calls=4, failure_ratio=0.5, cooldown=60)
+
+    def test_stays_closed_below_min_calls_and_ratio(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open)
+
+        # 4 ошибки из 9 - ниже failure_ratio
+        for _ in range(5):
+            self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.before_call()
+        self.assertFalse(self.breaker.is_open)
+
+    def test_opens_at_failure_ratio(self):
+        self.breaker.record_success()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.record_failure()
+
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def open(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+
+    def test_half_open_allows_a_single_probe(self):
+        self.open()
+        self.now += 61
+        self.assertFalse(self.breaker.is_open)
+
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_successful_probe_closes(self):
+        self.open()
+        self.now += 61
+        self.breaker.before_call()
+        self.breaker.record_success()
+
+        self.breaker.before_call()
+        self.breaker.before_call()
+        # История ошибок сброшена: одна новая ошибка цепь не размыкает
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open)
+
+    def test_failed_probe_reopens_for_full_cooldown(self):
+        self.open()
+        self.now += 61
+        self.breaker.before_call()
+        self.breaker.record_failure()
+
+        self.assertTrue(self.breaker.is_open)
+        self.now += 59
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.now += 2
+        self.breaker.before_call()
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def retry_state(self, exc, attempt=1):
+        state = mock.Mock(attempt_number=attempt)
+        state.outcome.exception.return_value = exc
+        return state
+
+    def test_retryable_errors(self):
+        self.assertTrue(_is_retryable(requests.ConnectionError()))
+        self.assertTrue(_is_retryable(requests.Timeout()))
+        self.assertTrue(_is_retryable(http_error(429)))
+        self.assertTrue(_is_retryable(http_error(503)))
+
+    def test_client_errors_are_not_retried(self):
+        self.assertFalse(_is_retryable(http_error(400)))
+        self.assertFalse(_is_retryable(http_error(404)))
+        self.assertFalse(_is_retryable(requests.HTTPError()))
+        self.assertFalse(_is_retryable(ValueError('bad json')))
+        self.assertFalse(_is_retryable(CircuitOpenError('open')))
+
+    def test_retry_after_is_honoured_and_capped(self):
+        self.assertEqual(_backoff_wait(self.retry_state(http_error(429, {'Retry-After': '7'}))), 7)
+        self.assertEqual(_backoff_wait(self.retry_state(http_error(429, {'Retry-After': '600'}))), MAX_RETRY_WAIT)
+
+    def test_exponential_jitter_without_retry_after(self):
+        for attempt in range(1, 8):
+            for exc in (http_error(503), http_error(429, {'Retry-After': 'Wed, 21 Oct 2026 07:28:00 GMT'}), requests.Timeout()):
+                wait = _backoff_wait(self.retry_state(exc, attempt))
+                self.assertGreaterEqual(wait, 0)
+                self.assertLessEqual(wait, min(2 ** attempt, MAX_RETRY_WAIT))
+
+
+class LttbTests(SimpleTestCase):
+    def test_keeps_endpoints_and_length(self):
+        values = [((i * 37) % 101) / 7 for i in range(500)]
+        for points in (3, 4, 10, 33, 499):
+            sampled = lttb(values, points)
+            self.assertEqual(len(sampled), points)
+            self.assertEqual(sampled[0], values[0])
+            self.assertEqual(sampled[-1], values[-1])
+
+    def test_keeps_spike(self):
+        values = [0.0] * 200
+        values[123] = 50.0
+        self.assertIn(50.0, lttb(values, 12))
+
+    def test_short_series_unchanged(self):
+        values = [1, 5, 2, 8]
+        self.assertEqual(lttb(values, 4), values)
+        self.assertEqual(lttb(values, 100), values)
+        self.assertEqual(lttb([], 10), [])
+
+    def test_degenerate_threshold_returns_copy(self):
+        values = [3, 1, 4, 1, 5, 9, 2, 6]
+        for points in (-1, 0, 1, 2):
+            sampled = lttb(values, points)
+            self.assertEqual(sampled, values)
+            self.assertIsNot(sampled, values)
+
+
+class CursorTests(SimpleTestCase):
+    ITEMS = [(-float(apr), symbol) for apr, symbol in sorted(((i % 7, f"S{i:02d}") for i in range(40)), key=lambda x: (-x[0], x[1]))]
+
+    def key(self, item):
+        return item
+
+    def test_round_trip(self):
+        for key, reverse in ((('-12.5', 'BTC', 'Binance'), False), ((-3.0, 'ETH'), True)):
+            self.assertEqual(decode_cursor(encode_cursor(key, reverse), len(key)), (tuple(key), reverse))
+
+    def test_malformed_cursors(self):
+        for raw in ('', 'not base64!', encode_cursor(['x']), 'eyJrIjpbXX0', encode_cursor([1, 2])[:-3]):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(raw, 2)
+
+    def test_forged_key_of_wrong_type(self):
+        with self.assertRaises(InvalidCursor):
+            paginate_sorted(self.ITEMS, self.key, 2, encode_cursor(['abc', 1]), 5)
+
+    def test_pages_forward_and_back(self):
+        pages, cursor = [], None
+        while True:
+            page, cursor, previous = paginate_sorted(self.ITEMS, self.key, 2, cursor, 7)
+            self.assertEqual(previous is None, not pages)
+            pages.append(page)
+            if cursor is None:
+                break
+        self.assertEqual([item for page in pages for item in page], self.ITEMS)
+
+        # От последней страницы назад по previous - те же страницы в обратном порядке
+        cursor = paginate_sorted(self.ITEMS, self.key, 2, encode_cursor(pages[-2][-1]), 7)[2]
+        for expected in reversed(pages[:-1]):
+            page, next_cursor, cursor = paginate_sorted(self.ITEMS, self.key, 2, cursor, 7)
+            self.assertEqual(page, expected)
+            self.assertIsNotNone(next_cursor)
+        self.assertIsNone(cursor)
+
+
+class SymbolIndexTests(SimpleTestCase):
+    ROWS = [
+        (1, 'kPEPE', 'kPEPE', 'Hyperliquid', 'PEPE', None),
+        (2, 'PEPE', 'PEPEUSDT', 'Binance', 'PEPE', None),
+        (3, 'BTC', 'BTCUSDT', 'Binance', 'BTC', None),
+        (4, 'kBONK', 'kBONK', 'Hyperliquid', 'BONK', None),
+    ]
+
+    def setUp(self):
+        self.index = symbol_index.SymbolIndex(self.ROWS)
+
+    def test_search_returns_symbols_as_stored(self):
+        self.assertEqual(self.index.contains('pepe'), {'kPEPE', 'PEPE'})
+        self.assertEqual(self.index.contains('kp'), {'kPEPE'})
+        self.assertEqual(self.index.prefix('KPE'), ['kPEPE'])
+        self.assertEqual(self.index.prefix('k'), ['kBONK', 'kPEPE'])
+
+    def test_suggest_keeps_case(self):
+        suggestions = self.index.suggest('pep')
+        self.assertEqual([s['symbol'] for s in suggestions], ['PEPE', 'kPEPE'])
+        self.assertEqual(suggestions[1]['exchanges'], ['Hyperliquid'])
+
+    def test_ticker_lookup_ignores_case(self):
+        self.assertEqual(self.index.ticker_id('hyperliquid', 'KPEPE'), 1)
+        self.assertEqual(self.index.ticker_id('BINANCE', 'pepeusdt'), 2)
+
+
+class ApiTestCase(TestCase):
+    """Данные для API без Redis; кэши процесса (индекс, рейтинг, биржи) собираются заново в каждом тесте"""
+
+    SYMBOLS = ('BTC', 'ETH', 'kPEPE', 'SOL', 'DOGE')
+
+    @classmethod
+    def setUpTestData(cls):
+        for exchange_name, sign in (('Alpha', 1), ('Beta', -1)):
+            exchange = Exchange.objects.create(name=exchange_name)
+            for i, symbol in enumerate(cls.SYMBOLS):
+                ticker = Ticker.objects.create(exchange=exchange, symbol=symbol, original_symbol=f"{symbol}USDT", last_price=1)
+                for period in ('live', '1d'):
+                    TickerStats.objects.create(
+                        ticker=ticker, period=period, avg_apr=sign * (i + 1) * (2 if sign > 0 else 1),
+                        live_apr=sign * (i + 1), history=[i, i + 1], sparkline=[i, i + 1],
+                    )
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(redis_client, '_client', redis.Redis(port=1, socket_connect_timeout=0.1)),
+            mock.patch.object(funding_table._exchange_names, '_value', None),
+            mock.patch.object(symbol_index._index, '_value', None),
+            mock.patch.object(ranking._ranking, '_value', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class FundingTableApiTests(ApiTestCase):
+    URL = '/api/funding-table/'
+
+    def test_bad_cursor_is_400(self):
+        for cursor in ('garbage', encode_cursor(['abc', 1]), encode_cursor([[1], 'BTC']), encode_cursor([1, 2, 3])):
+            response = self.client.get(self.URL, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def test_pages_cover_table(self):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(self.URL, params).json()
+            seen += [row['symbol'] for row in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(self.SYMBOLS))
+        self.assertEqual(data['count'], len(self.SYMBOLS))
+
+    def test_search_matches_mixed_case_symbol(self):
+        data = self.client.get(self.URL, {'q': 'pepe'}).json()
+        self.assertEqual([row['symbol'] for row in data['results']], ['kPEPE'])
+
+    def test_etag_for_version_zero(self):
+        with mock.patch.object(data_version, 'get_data_version', return_value=0):
+            response = self.client.get(self.URL)
+            self.assertEqual(response['ETag'], '"funding-v0"')
+            self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH='"funding-v0"').status_code, 304)
+
+    def test_stale_snapshot_carries_its_own_version(self):
+        rows = funding_table.build_funding_table('1d', [], 'spread')
+        with mock.patch.object(data_version, 'get_data_version', return_value=4), \
+                mock.patch.object(api_views, 'get_funding_table', return_value=funding_table.FundingTable(rows, 3, True)):
+            response = self.client.get(self.URL)
+        self.assertEqual(response['ETag'], '"funding-v3"')
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class BestOpportunitiesApiTests(ApiTestCase):
+    URL = '/api/best-opportunities/'
+
+    def test_forged_cursor_is_400(self):
+        for key in ([None, 'BTC', 'Alpha'], [[1], 'BTC', 'Alpha'], ['NaN', 'BTC', 'Alpha'],
+                    ['Infinity', 'BTC', 'Alpha'], ['abc', 'BTC', 'Alpha'], [{}, 'BTC', 'Alpha']):
+            response = self.client.get(self.URL, {'cursor': encode_cursor(key)})
+            self.assertEqual(response.status_code, 400, key)
+
+    def test_pages_forward_and_back(self):
+        first = self.client.get(self.URL, {'page_size': 3}).json()
+        self.assertEqual(first['count'], 2 * len(self.SYMBOLS))
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(self.URL, {'page_size': 3, 'cursor': first['next']}).json()
+        back = self.client.get(self.URL, {'page_size': 3, 'cursor': second['previous']}).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_search_matches_mixed_case_symbol(self):
+        data = self.client.get(self.URL, {'q': 'pepe'}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual({(row['symbol'], row['exchange']) for row in data['results']}, {('kPEPE', 'Alpha'), ('kPEPE', 'Beta')})
+
+
+class RankingSnapshotTests(SimpleTestCase):
+    ROWS = [
+        ('1d', Decimal('12.5000'), 'BTC', 'Alpha', Decimal('65000.10000000')),
+        ('1d', Decimal('-30.0000'), 'kPEPE', 'Beta', None),
+        ('1d', Decimal('12.5000'), 'ETH', 'Alpha', Decimal('3000')),
+        ('7d', Decimal('0.0000'), 'SOL', 'Alpha', Decimal('150')),
+    ]
+
+    def test_snapshot_round_trip(self):
+        restored = ranking.decode_rows(loads(dumps(ranking.encode_rows(self.ROWS))))
+        self.assertEqual(
+            ranking.OpportunityRanking(restored).partitions,
+            ranking.OpportunityRanking(self.ROWS).partitions,
+        )
+
+    def test_snapshot_is_in_rank_order(self):
+        self.assertEqual([row[2] for row in ranking.encode_rows(self.ROWS)], ['kPEPE', 'BTC', 'ETH', 'SOL'])
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    DATA = {
+        'apr': Decimal('12.3400'), 'small': 1e-05, 'big': 1e16, 'time': T0, 'text': 'a\u2028b', 'nested': [{'x': None}],
+    }
+
+    def test_same_values_as_drf(self):
+        ours, drf = ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA)
+        self.assertEqual(loads(ours), loads(drf))
+        self.assertNotIn('\u2028'.encode(), ours)
+
+    @mock.patch('scanner.renderers.orjson', None)
+    def test_without_orjson(self):
+        self.assertEqual(ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    def test_non_finite_floats(self):
+        if orjson is None:
+            self.skipTest('orjson не установлен')
+        self.assertEqual(loads(ORJSONRenderer().render({'v': float('nan')})), {'v': None})
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'v': float('nan')})
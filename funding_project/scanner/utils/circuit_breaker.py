@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Биржа признана недоступной, запрос не отправлялся"""
+
+
+class CircuitBreaker:
+    """
+    Размыкается, когда доля ошибок за последние window запросов достигает failure_ratio.
+    Через cooldown секунд пропускает один пробный запрос: успех замыкает цепь, ошибка - снова размыкает.
+    """
+
+    def __init__(self, name, window=20, min_calls=10, failure_ratio=0.5, cooldown=60):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self._results = deque(maxlen=window)
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._probe_in_flight:
+                raise CircuitOpenError(f"{self.name}: API недоступно, запросы приостановлены")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._results.append(True)
+            if self._opened_at is not None:
+                logger.info(f"{self.name}: API снова отвечает, цепь замкнута")
+                self._opened_at = None
+                self._probe_in_flight = False
+                self._results.clear()
+
+    def record_failure(self):
+        with self._lock:
+            self._results.append(False)
+            if self._opened_at is not None:
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                return
+
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_ratio:
+                logger.warning(f"{self.name}: {failures}/{len(self._results)} запросов с ошибкой, цепь разомкнута на {self.cooldown} сек")
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(exchange_name):
+    with _breakers_lock:
+        if exchange_name not in _breakers:
+            _breakers[exchange_name] = CircuitBreaker(exchange_name)
+        return _breakers[exchange_name]
@@ -0,0 +1,58 @@
+import base64
+import bisect
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key, reverse=False):
+    """Непрозрачный курсор: ключ сортировки строки-границы и направление (назад/вперёд)"""
+    payload = json.dumps({'k': list(key), 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(raw, size):
+    """Возвращает (key, reverse); битый или чужой курсор - InvalidCursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+        key, reverse = payload['k'], payload['r']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(key, list) or len(key) != size or not isinstance(reverse, bool):
+        raise InvalidCursor('Invalid cursor')
+    return tuple(key), reverse
+
+
+def parse_page_size(value, default, maximum=100):
+    try:
+        return min(max(int(value), 1), maximum)
+    except (TypeError, ValueError):
+        return default
+
+
+def paginate_sorted(items, key, key_size, raw_cursor, page_size):
+    """
+    Keyset-пагинация по уже отсортированному списку: позиция курсора ищется
+    бинарным поиском по key(item), поэтому глубокая страница стоит как первая.
+    Возвращает (page, next_cursor, previous_cursor).
+    """
+    start, end = 0, page_size
+    if raw_cursor:
+        cursor_key, reverse = decode_cursor(raw_cursor, key_size)
+        try:
+            if reverse:
+                end = bisect.bisect_left(items, cursor_key, key=key)
+                start = max(0, end - page_size)
+            else:
+                start = bisect.bisect_right(items, cursor_key, key=key)
+                end = start + page_size
+        except TypeError:
+            raise InvalidCursor('Invalid cursor')
+
+    page = items[start:end]
+    next_cursor = encode_cursor(key(page[-1])) if page and end < len(items) else None
+    previous_cursor = encode_cursor(key(page[0]), reverse=True) if page and start > 0 else None
+    return page, next_cursor, previous_cursor
+
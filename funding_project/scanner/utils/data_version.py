@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+import redis
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from scanner.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'funding:data_version'
+UPDATED_AT_KEY = 'funding:updated_at'
+
+
+def get_data_version():
+    """Текущая версия данных фандинга; None, если Redis недоступен"""
+    try:
+        return int(get_redis().get(VERSION_KEY) or 0)
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, версия данных неизвестна: {e}")
+        return None
+
+
+def bump_data_version():
+    """Отмечает, что данные фандинга изменились: все закэшированные снапшоты становятся устаревшими"""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.incr(VERSION_KEY)
+        pipe.set(UPDATED_AT_KEY, time.time())
+        version, _ = pipe.execute()
+        return version
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, версия данных не увеличена: {e}")
+        return None
+
+
+def get_data_updated_at():
+    """Время последнего изменения данных фандинга; None, если неизвестно"""
+    try:
+        raw = get_redis().get(UPDATED_AT_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Redis недоступен, время обновления данных неизвестно: {e}")
+        return None
+    return datetime.fromtimestamp(float(raw), tz=dt_timezone.utc) if raw else None
+
+
+def version_etag(version):
+    return f'"funding-v{version}"'
+
+
+def data_etag(request, *args, **kwargs):
+    version = get_data_version()
+    return version_etag(version) if version is not None else None
+
+
+def data_last_modified(request, *args, **kwargs):
+    return get_data_updated_at()
+
+
+def conditional_on_data(view_func):
+    """
+    ETag/Last-Modified по версии данных: повторный опрос между сканами получает 304
+    до любой работы с БД. no-cache - браузер всегда переспрашивает, а не угадывает свежесть.
+    Вешать на dispatch (method_decorator), пока запрос ещё HttpRequest.
+    """
+    view_func = condition(etag_func=data_etag, last_modified_func=data_last_modified)(view_func)
+    return cache_control(no_cache=True)(view_func)
+
+
+def patch_served_version(response, version, stale=False):
+    """
+    ETag по версии данных, которые реально в ответе (снапшот может быть старше текущей).
+    Устаревший ответ не кэшируется: его Last-Modified от conditional_on_data был бы уже новым.
+    """
+    if version is not None:
+        response.headers['ETag'] = version_etag(version)
+    if stale:
+        patch_cache_control(response, no_store=True)
+    return response
+
+
+class VersionedValue:
+    """
+    Значение в памяти процесса (индекс, рейтинг), которое пересобирается,
+    когда скан увеличил версию данных. Без Redis - не чаще раза в fallback_ttl секунд.
+    """
+
+    def __init__(self, build, fallback_ttl=60):
+        self._build = build
+        self._fallback_ttl = fallback_ttl
+        self._value = None
+        self._version = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, version):
+        if self._value is None:
+            return False
+        if version is None:
+            return time.monotonic() - self._built_at < self._fallback_ttl
+        return version == self._version
+
+    def get(self):
+        version = get_data_version()
+        if self._is_fresh(version):
+            return self._value
+
+        with self._lock:
+            if not self._is_fresh(version):
+                self._value = self._build()
+                self._version = version
+                self._built_at = time.monotonic()
+        return self._value
@@ -0,0 +1,31 @@
+def lttb(values, points):
+    """
+    Largest-Triangle-Three-Buckets: прореживает ряд до points точек,
+    сохраняя первую, последнюю и визуально значимые (пики) точки.
+    """
+    n = len(values)
+    if points >= n or points < 3:
+        return list(values)
+
+    sampled = [values[0]]
+    every = (n - 2) / (points - 2)
+    a = 0
+    for i in range(points - 2):
+        # Средняя точка следующего бакета - третья вершина треугольника
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (avg_start + avg_end - 1) / 2
+        avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+
+        ay = values[a]
+        max_area = -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (values[j] - ay) - (a - j) * (avg_y - ay))
+            if area > max_area:
+                max_area, chosen = area, j
+
+        sampled.append(values[chosen])
+        a = chosen
+
+    sampled.append(values[-1])
+    return sampled
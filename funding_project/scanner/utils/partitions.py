@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection as default_connection
+
+logger = logging.getLogger(__name__)
+
+FUNDING_TABLE = 'scanner_fundingrate'
+
+
+def partition_interval():
+    interval = getattr(settings, 'FUNDING_PARTITION_INTERVAL', 'month')
+    if interval not in ('month', 'week'):
+        raise ValueError(f"FUNDING_PARTITION_INTERVAL: ожидается 'month' или 'week', получено {interval!r}")
+    return interval
+
+
+def partition_bounds(moment, interval='month'):
+    """Границы [start, end) партиции, в которую попадает moment (UTC)"""
+    day = moment.astimezone(dt_timezone.utc).date()
+    if interval == 'week':
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    else:
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+
+    to_utc = lambda d: datetime(d.year, d.month, d.day, tzinfo=dt_timezone.utc)
+    return to_utc(start), to_utc(end)
+
+
+def partition_name(start, interval='month', table=FUNDING_TABLE):
+    if interval == 'week':
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{table}_y{iso_year}w{iso_week:02d}"
+    return f"{table}_y{start.year}m{start.month:02d}"
+
+
+def is_partitioned(connection=default_connection, table=FUNDING_TABLE):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_horizon(moment, interval='month', ahead=2):
+    """Начало периода, отстоящего от moment на ahead партиций вперёд"""
+    horizon = moment
+    for _ in range(ahead):
+        horizon = partition_bounds(horizon, interval)[1]
+    return horizon
+
+
+def create_partitions(connection, start_moment, end_moment, interval='month', table=FUNDING_TABLE):
+    """Создаёт недостающие партиции, покрывающие [start_moment, end_moment], и DEFAULT-партицию"""
+    quote = connection.ops.quote_name
+    default = f"{table}_default"
+    created = []
+    start, end = partition_bounds(start_moment, interval)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default])
+        has_default = cursor.fetchone()[0]
+
+        while start <= end_moment:
+            name = partition_name(start, interval, table)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                bounds = [start, end]
+                stray = False
+                if has_default:
+                    cursor.execute(
+                        f'SELECT EXISTS (SELECT 1 FROM {quote(default)} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+                        bounds,
+                    )
+                    stray = cursor.fetchone()[0]
+
+                if stray:
+                    # Строки периода уже осели в DEFAULT: переносим их в новую таблицу и только потом подключаем её
+                    cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)")
+                    cursor.execute(
+                        f'WITH moved AS (DELETE FROM {quote(default)} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                        f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                        bounds,
+                    )
+                    cursor.execute(
+                        f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+                        bounds,
+                    )
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                        bounds,
+                    )
+                created.append(name)
+            start = end
+            end = partition_bounds(start, interval)[1]
+
+        if not has_default:
+            cursor.execute(f"CREATE TABLE {quote(default)} PARTITION OF {quote(table)} DEFAULT")
+    return created
+
+
+def ensure_partitions(ahead=None, connection=default_connection):
+    """Заранее создаёт партиции на ближайшие периоды, чтобы свежие ставки не падали в DEFAULT"""
+    if not is_partitioned(connection):
+        return []
+
+    interval = partition_interval()
+    ahead = getattr(settings, 'FUNDING_PARTITIONS_AHEAD', 2) if ahead is None else ahead
+    now = datetime.now(dt_timezone.utc)
+
+    created = create_partitions(connection, now, partition_horizon(now, interval, ahead), interval)
+    for name in created:
+        logger.info(f"PARTITIONS: создана партиция {name}")
+    return created
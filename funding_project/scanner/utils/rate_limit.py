@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+import redis
+from django.conf import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Резервирует weight токенов и возвращает, сколько секунд ждать до своей очереди.
+# Баланс может уходить в минус: каждый вызов встаёт в очередь за предыдущими,
+# поэтому процессы не опрашивают Redis в цикле, а спят ровно до своего слота.
+RESERVE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local weight = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - weight
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+_script = None
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+class TokenBucketLimiter:
+    """Token bucket с весами запросов, общий для всех воркеров через Redis"""
+
+    def __init__(self, name, limit, period, headroom=1.0):
+        self.key = f"ratelimit:{name}"
+        self.capacity = limit * headroom
+        self.refill_rate = self.capacity / period
+
+    def acquire(self, weight=1):
+        """Блокирует поток, пока биржа не готова принять запрос весом weight"""
+        wait = self._reserve(weight)
+        if wait > 0:
+            time.sleep(wait)
+
+    def charge(self, weight):
+        """Досписывает вес, который стал известен только после ответа (без ожидания)"""
+        if weight > 0:
+            self._reserve(weight)
+
+    def _reserve(self, weight):
+        global _script
+        try:
+            if _script is None:
+                _script = get_redis().register_script(RESERVE_SCRIPT)
+            return float(_script(keys=[self.key], args=[self.capacity, self.refill_rate, weight]))
+        except redis.RedisError as e:
+            logger.warning(f"Redis недоступен для {self.key}, лимит считается локально: {e}")
+            return self._reserve_local(weight)
+
+    def _reserve_local(self, weight):
+        with _local_lock:
+            now = time.monotonic()
+            tokens, ts = _local_buckets.get(self.key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - ts) * self.refill_rate) - weight
+            _local_buckets[self.key] = (tokens, now)
+        return -tokens / self.refill_rate if tokens < 0 else 0
+
+
+def get_limiter(exchange_name):
+    limits = settings.EXCHANGE_RATE_LIMITS
+    config = limits.get(exchange_name, limits['default'])
+    return TokenBucketLimiter(
+        exchange_name.lower(),
+        config['limit'],
+        config['period'],
+        headroom=settings.EXCHANGE_RATE_LIMIT_HEADROOM,
+    )
@@ -4,6 +4,8 @@ from django.utils import timezone
 from datetime import timedelta
 from django.core.paginator import Paginator
 from .models import Ticker, Exchange, Asset, FundingRate
+from .services.symbol_index import get_symbol_index
+from .services.scanner_stats import get_scanner_stats
 
 def funding_table(request):
     period_param = request.GET.get('period', '1d')
@@ -21,7 +23,7 @@ def funding_table(request):
     tickers = Ticker.objects.all().select_related('exchange', 'asset').prefetch_related('funding_rates')
     
     if search_query:
-        tickers = tickers.filter(symbol__icontains=search_query)
+        tickers = tickers.filter(symbol__in=get_symbol_index().contains(search_query))
     
     if selected_exchanges:
         tickers = tickers.filter(exchange_id__in=selected_exchanges)
@@ -172,7 +174,7 @@ def best_opportunities(request):
 
     # Фильтры
     if search_query:
-        tickers = tickers.filter(symbol__icontains=search_query)
+        tickers = tickers.filter(symbol__in=get_symbol_index().contains(search_query))
     if selected_exchanges:
         tickers = tickers.filter(exchange_id__in=selected_exchanges)
 
@@ -220,9 +222,4 @@ def best_opportunities(request):
     })
 
 def index(request):
-    stats = {
-        'total_coins': Ticker.objects.values('symbol').distinct().count(),
-        'total_exchanges': Exchange.objects.count(),
-        'last_update': FundingRate.objects.order_by('-timestamp').first()
-    }
-    return render(request, 'scanner/index.html', {'stats': stats})
\ No newline at end of file
+    return render(request, 'scanner/index.html', {'stats': get_scanner_stats()})
\ No newline at end of file
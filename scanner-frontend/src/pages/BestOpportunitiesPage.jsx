@@ -10,8 +10,8 @@ const BestOpportunitiesPage = () => {
     const [opps, setOpps] = useState([]);
     const [loading, setLoading] = useState(true);
     const [pagination, setPagination] = useState({
-        current_page: 1,
-        total_pages: 1,
+        next: null,
+        previous: null,
         count: 0
     });
 
@@ -21,20 +21,20 @@ const BestOpportunitiesPage = () => {
         q: ''
     });
 
-    const loadData = useCallback(async (page = 1) => {
+    const loadData = useCallback(async (cursor = null) => {
         setLoading(true);
         try {
             const params = {
                 ...filters,
-                page: page,
                 page_size: 12 
             };
+            if (cursor) params.cursor = cursor;
             const res = await api.get('api/best-opportunities/', { params });
             
             setOpps(res.data.results);
             setPagination({
-                current_page: res.data.current_page,
-                total_pages: res.data.total_pages,
+                next: res.data.next,
+                previous: res.data.previous,
                 count: res.data.count
             });
         } catch (err) {
@@ -45,7 +45,7 @@ const BestOpportunitiesPage = () => {
     }, [filters]);
 
     useEffect(() => {
-        loadData(1);
+        loadData();
     }, [loadData]);
 
     const handleSelectPosition = (type, rawSymbol, exchange) => {
@@ -66,36 +66,21 @@ const BestOpportunitiesPage = () => {
 
     const handleSearch = (e) => {
         e.preventDefault();
-        loadData(1);
+        loadData();
     };
 
     const renderPagination = () => {
-        const { current_page, total_pages } = pagination;
-        if (total_pages <= 1) return null;
-
-        let pages = [];
-        for (let i = Math.max(1, current_page - 2); i <= Math.min(total_pages, current_page + 2); i++) {
-            pages.push(i);
-        }
+        const { next, previous } = pagination;
+        if (!next && !previous) return null;
 
         return (
             <nav className="mt-5">
                 <ul className="pagination justify-content-center">
-                    <li className={`page-item ${current_page === 1 ? 'disabled' : ''}`}>
-                        <button className="page-link bg-dark border-secondary text-white" onClick={() => loadData(current_page - 1)}>«</button>
+                    <li className={`page-item ${!previous ? 'disabled' : ''}`}>
+                        <button className="page-link bg-dark border-secondary text-white" onClick={() => loadData(previous)}>«</button>
                     </li>
-                    {pages.map(num => (
-                        <li key={num} className={`page-item ${current_page === num ? 'active' : ''}`}>
-                            <button 
-                                className={`page-link ${current_page === num ? 'bg-warning border-warning text-dark' : 'bg-dark border-secondary text-white'}`}
-                                onClick={() => loadData(num)}
-                            >
-                                {num}
-                            </button>
-                        </li>
-                    ))}
-                    <li className={`page-item ${current_page === total_pages ? 'disabled' : ''}`}>
-                        <button className="page-link bg-dark border-secondary text-white" onClick={() => loadData(current_page + 1)}>»</button>
+                    <li className={`page-item ${!next ? 'disabled' : ''}`}>
+                        <button className="page-link bg-dark border-secondary text-white" onClick={() => loadData(next)}>»</button>
                     </li>
                 </ul>
             </nav>
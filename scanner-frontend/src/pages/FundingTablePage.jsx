@@ -7,6 +7,9 @@ import { AuthContext } from '../context/AuthContext';
 import { TradeContext } from '../context/TradeContext'; 
 import { toast } from 'react-toastify'; 
 
+// Ширина спарклайна в тултипе: бэкенд прореживает историю до этого числа точек
+const SPARKLINE_POINTS = 60;
+
 const FundingTablePage = () => {
     const { user } = useContext(AuthContext);
     
@@ -15,8 +18,9 @@ const FundingTablePage = () => {
     const navigate = useNavigate();
     const [data, setData] = useState([]);
     const [loading, setLoading] = useState(false);
-    const [totalPages, setTotalPages] = useState(1);
-    const [currentPage, setCurrentPage] = useState(1);
+    const [cursor, setCursor] = useState(null);
+    const [pageCursors, setPageCursors] = useState({ next: null, previous: null });
+    const [totalCount, setTotalCount] = useState(0);
     const [favorites, setFavorites] = useState([]);
     
     const [searchTerm, setSearchTerm] = useState('');
@@ -85,17 +89,19 @@ const FundingTablePage = () => {
         setLoading(true);
         try {
             const params = new URLSearchParams();
-            params.append('page', currentPage);
+            if (cursor) params.append('cursor', cursor);
             params.append('period', appliedFilters.period);
             params.append('sort', appliedFilters.sort);
             params.append('q', searchTerm);
+            params.append('points', SPARKLINE_POINTS);
             appliedFilters.exchanges.forEach(ex => params.append('exchanges', ex));
 
             const res = await api.get(`api/funding-table/?${params.toString()}`);
             setData(res.data.results || []);
-            setTotalPages(res.data.total_pages || 1);
+            setPageCursors({ next: res.data.next, previous: res.data.previous });
+            setTotalCount(res.data.count || 0);
         } catch (err) { console.error(err); } finally { setLoading(false); }
-    }, [currentPage, appliedFilters, searchTerm]);
+    }, [cursor, appliedFilters, searchTerm]);
 
     useEffect(() => {
         fetchData();
@@ -104,7 +110,7 @@ const FundingTablePage = () => {
 
     const handleApplyFilters = () => {
         setAppliedFilters({...tempFilters});
-        setCurrentPage(1);
+        setCursor(null);
         setShowFilterModal(false);
         localStorage.setItem('f_period', tempFilters.period);
         localStorage.setItem('f_sort', tempFilters.sort);
@@ -135,7 +141,7 @@ const FundingTablePage = () => {
                             <span className="input-group-text bg-black border-secondary"><i className="bi bi-search text-warning"></i></span>
                             <input 
                                 type="text" className="form-control bg-black border-secondary text-white shadow-none" 
-                                placeholder="Поиск..." value={searchTerm} onChange={(e) => {setSearchTerm(e.target.value); setCurrentPage(1);}}
+                                placeholder="Поиск..." value={searchTerm} onChange={(e) => {setSearchTerm(e.target.value); setCursor(null);}}
                             />
                         </div>
                     </div>
@@ -227,47 +233,26 @@ const FundingTablePage = () => {
                     </table>
                 </div>
 
-                {totalPages > 1 && (
+                {(pageCursors.next || pageCursors.previous) && (
                     <div className="d-flex flex-column flex-md-row justify-content-between align-items-center p-3 bg-black border-top border-secondary gap-3">
                         <span className="text-muted small">
-                            Показано объектов: <span className="text-white">{data.length}</span> (Стр. {currentPage} из {totalPages})
+                            Показано объектов: <span className="text-white">{data.length}</span> из {totalCount}
                         </span>
                         
                         <nav>
                             <ul className="pagination pagination-sm mb-0 shadow-sm">
-                                <li className={`page-item ${currentPage === 1 ? 'disabled' : ''}`}>
+                                <li className={`page-item ${!pageCursors.previous ? 'disabled' : ''}`}>
                                     <button 
                                         className="page-link bg-dark border-secondary text-white px-3" 
-                                        onClick={() => setCurrentPage(prev => Math.max(1, prev - 1))}
+                                        onClick={() => setCursor(pageCursors.previous)}
                                     >
                                         <i className="bi bi-chevron-left text-warning"></i>
                                     </button>
                                 </li>
-
-                                {(() => {
-                                    let pages = [];
-                                    const start = Math.max(1, currentPage - 2);
-                                    const end = Math.min(totalPages, currentPage + 2);
-
-                                    for (let i = start; i <= end; i++) {
-                                        pages.push(
-                                            <li key={i} className={`page-item ${currentPage === i ? 'active' : ''}`}>
-                                                <button 
-                                                    className={`page-link border-secondary ${currentPage === i ? 'bg-warning border-warning text-dark fw-bold' : 'bg-dark text-white'}`}
-                                                    onClick={() => setCurrentPage(i)}
-                                                >
-                                                    {i}
-                                                </button>
-                                            </li>
-                                        );
-                                    }
-                                    return pages;
-                                })()}
-
-                                <li className={`page-item ${currentPage === totalPages ? 'disabled' : ''}`}>
+                                <li className={`page-item ${!pageCursors.next ? 'disabled' : ''}`}>
                                     <button 
                                         className="page-link bg-dark border-secondary text-white px-3" 
-                                        onClick={() => setCurrentPage(prev => Math.min(totalPages, prev + 1))}
+                                        onClick={() => setCursor(pageCursors.next)}
                                     >
                                         <i className="bi bi-chevron-right text-warning"></i>
                                     </button>